@@ -1,8 +1,59 @@
+import os
+
+
 class FileOrganizerConfig:
     """Configuration constants for the file organizer."""
     LOG_FILE = "logs//file_organizer_log.json"
+    COMPACT_LOG_FILE = "logs//file_organizer_log.bin"
+    LOG_ENCODING = "json"  # "json" or "compact"
     DATE_FORMAT = "%Y-%m-%d_%H-%M-%S"
     HASH_BLOCK_SIZE = 65536
+    HASH_BUFFER_SIZE = 1024 * 1024
+    MMAP_HASH_THRESHOLD = 64 * 1024 * 1024
+    MMAP_HASH_STEP = 16 * 1024 * 1024
+    PARTIAL_HASH_SIZE = 65536
+    HASH_MIN_WORKERS = 2
+    HASH_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+    HASH_WARMUP_JOBS = 64
+    HASH_ADAPT_INTERVAL = 0.5  # seconds per throughput measurement window
+    HASH_SMALL_FILE_BYTES = 64 * 1024
+    DUPLICATE_HASH_ALGORITHM = "sha256"  # see scripts/benchmark_hashes.py
+    HASH_CACHE_FILE = "logs//hash_cache.sqlite3"
+    HASH_CACHE_MAX_ENTRIES = 1_000_000
+    HASH_CACHE_BATCH_SIZE = 1000
+    UNDO_MAX_WORKERS = 8
+    DEDUP_MAX_WORKERS = 8
+    DEDUP_LOG_BATCH = 100
+    IO_ROTATIONAL_CONCURRENCY = 1
+    IO_SOLID_STATE_CONCURRENCY = 16
+    HASH_MAX_DEFERRED = 256
+    CDC_MIN_FILE_SIZE = 1024 * 1024  # smaller files are not worth chunking
+    CDC_MIN_CHUNK = 16 * 1024
+    CDC_AVG_CHUNK = 64 * 1024  # power of two
+    CDC_MAX_CHUNK = 256 * 1024
+    CDC_READ_SIZE = 4 * 1024 * 1024
+    CDC_MAX_BYTES_PER_FILE = 32 * 1024 * 1024  # larger files are compared on their leading bytes
+    CDC_SIMILARITY_THRESHOLD = 0.5
+    CDC_MAX_CHUNK_FANOUT = 256  # chunks shared by more files are ignored when pairing
+    ENCRYPTION_CHUNK_SIZE = 1024 * 1024
+    TIER_CODEC = "gzip"  # "gzip", "xz" or "zstd" (needs the zstandard package)
+    TIER_MIN_AGE_DAYS = 365
+    TIER_MIN_SIZE = 4096
+    TIER_GZIP_LEVEL = 6
+    TIER_XZ_PRESET = 6
+    TIER_ZSTD_LEVEL = 10
+    TIER_LOG_BATCH = 50  # originals are removed only after their batch is logged
+    AUDIT_LOG_FILE = "logs//security_audit.jsonl"
+    AUDIT_LOG_MAX_BYTES = 10 * 1024 * 1024
+    AUDIT_LOG_BACKUPS = 5
+    INTEGRITY_HASH_ALGORITHM = "sha256"
+    INTEGRITY_MANIFEST_DIR = "logs//manifests"
+    SCAN_CACHE_RECHECK_SECONDS = 30  # how long the UI trusts a tree fingerprint before re-walking it
+    PREVIEW_PAGE_SIZE = 20
+    JOB_MAX_WORKERS = 4
+    JOB_HISTORY = 50  # finished background jobs remembered for the UI
+    JOB_POLL_INTERVAL = 0.5  # seconds between UI refreshes while jobs run
+    BULK_CRYPTO_STATE_FILE = "logs//bulk_{action}.state.jsonl"  # resume point of an interrupted bulk run
     
     EXTENSIONS_MAPPING = {
         "Images": ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.svg'),
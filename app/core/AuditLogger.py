@@ -0,0 +1,92 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+
+
+logger = logging.getLogger(__name__)
+
+
+class _JsonLineFormatter(logging.Formatter):
+    """One JSON object per line: time, level, action plus the record's audit fields."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "action": record.msg,
+        }
+        entry.update(getattr(record, "audit", {}))
+        return json.dumps(entry, default=str)
+
+
+class _DirectQueueHandler(QueueHandler):
+    """Enqueues records untouched; formatting happens on the listener thread."""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class AuditLogger:
+    """Structured security audit trail written off the caller's thread.
+    
+    Callers only build a record and put it on an in-process queue; a
+    ``QueueListener`` thread serializes it as a JSON line into a rotating
+    file.  The underlying logger is standalone, so it neither reaches nor is
+    affected by the root logger other modules configure.
+    """
+    
+    _shared: Dict[str, "AuditLogger"] = {}
+    _shared_lock = threading.Lock()
+    
+    def __init__(self, path: str = FileOrganizerConfig.AUDIT_LOG_FILE,
+                 max_bytes: int = FileOrganizerConfig.AUDIT_LOG_MAX_BYTES,
+                 backup_count: int = FileOrganizerConfig.AUDIT_LOG_BACKUPS):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        file_handler.setFormatter(_JsonLineFormatter())
+        
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._listener = QueueListener(self._queue, file_handler)
+        self._listener.start()
+        self._closed = False
+        self._logger = logging.Logger("security.audit", logging.INFO)
+        self._logger.addHandler(_DirectQueueHandler(self._queue))
+    
+    @classmethod
+    def shared(cls, path: str = FileOrganizerConfig.AUDIT_LOG_FILE) -> "AuditLogger":
+        """Return the process-wide audit logger for ``path``."""
+        with cls._shared_lock:
+            if path not in cls._shared:
+                cls._shared[path] = cls(path)
+                atexit.register(cls._shared[path].close)
+            return cls._shared[path]
+    
+    def event(self, action: str, path: Optional[str] = None, outcome: str = "success",
+              level: int = logging.INFO, **details) -> None:
+        """Record one audit event; extra keyword arguments become fields of the record."""
+        if not self._logger.isEnabledFor(level):
+            return
+        details["outcome"] = outcome
+        if path is not None:
+            details["path"] = path
+        # makeRecord + handle skips Logger.log's stack walk for the caller's location
+        self._logger.handle(self._logger.makeRecord(self._logger.name, level, "", 0, action, None, None,
+                                                    extra={"audit": details}))
+    
+    def close(self) -> None:
+        """Drain the queue and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
@@ -0,0 +1,387 @@
+import gzip
+import lzma
+import os
+import shutil
+import tarfile
+import time
+from collections import defaultdict
+from concurrent.futures import as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+from app.core.FileLogger import FileLogger
+from app.core.FileUtils import FileUtils
+from app.core.HashScheduler import process_pool
+from app.core.IOScheduler import IOScheduler
+
+try:
+    import zstandard
+except ImportError:  # optional, enables the zstd codec
+    zstandard = None
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# codec -> file suffix
+CODECS: Dict[str, str] = {"gzip": ".gz", "xz": ".xz"}
+if zstandard is not None:
+    CODECS["zstd"] = ".zst"
+
+# Already-compressed formats gain nothing from another pass
+INCOMPRESSIBLE = {".gz", ".xz", ".zst", ".bz2", ".zip", ".7z", ".rar",
+                  ".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp3", ".aac", ".ogg", ".m4a",
+                  ".mp4", ".mkv", ".mov", ".webm", ".avi", ".flv", ".wmv"}
+
+
+def open_compressed(path: str, codec: str, mode: str):
+    """Binary file object that compresses on write / decompresses on read."""
+    if codec == "gzip":
+        return gzip.open(path, mode, compresslevel=FileOrganizerConfig.TIER_GZIP_LEVEL)
+    if codec == "xz":
+        return lzma.open(path, mode, preset=FileOrganizerConfig.TIER_XZ_PRESET) if "w" in mode else lzma.open(path, mode)
+    if codec == "zstd" and zstandard is not None:
+        return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=FileOrganizerConfig.TIER_ZSTD_LEVEL))
+    raise ValueError(f"Unsupported codec '{codec}'; available: {', '.join(CODECS)}")
+
+
+def _temp_path(path: str) -> str:
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tier-tmp")
+
+
+def compress_job(path: str, codec: str, destination: str) -> Tuple[str, int, int]:
+    """Compress one file to ``destination``; returns (destination, size, compressed size).
+    
+    Module level so process pools can pickle it.  The original stays until
+    the caller has logged the result.  Files that would not shrink are left
+    alone and reported with an empty destination.
+    """
+    temp_path = _temp_path(destination)
+    size = os.path.getsize(path)
+    try:
+        with open(path, 'rb') as src, open_compressed(temp_path, codec, 'wb') as dst:
+            shutil.copyfileobj(src, dst, FileOrganizerConfig.HASH_BUFFER_SIZE)
+        compressed = os.path.getsize(temp_path)
+        if compressed >= size:
+            os.remove(temp_path)
+            return "", size, size
+        shutil.copystat(path, temp_path)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return destination, size, compressed
+
+
+def bundle_job(directory: str, names: List[str], codec: str, archive: str) -> Tuple[str, int, int]:
+    """Pack ``names`` from ``directory`` into the compressed tar ``archive``.
+    
+    Returns (archive, total size, archive size); the originals stay until the
+    caller has logged the result.
+    """
+    temp_path = _temp_path(archive)
+    size = 0
+    try:
+        with open_compressed(temp_path, codec, 'wb') as stream, tarfile.open(fileobj=stream, mode='w|') as tar:
+            for name in names:
+                tar.add(os.path.join(directory, name), arcname=name, recursive=False)
+                size += os.path.getsize(os.path.join(directory, name))
+        os.replace(temp_path, archive)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return archive, size, os.path.getsize(archive)
+
+
+def _restore(entry: Dict, src, temp_path: str) -> None:
+    with open(temp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, FileOrganizerConfig.HASH_BUFFER_SIZE)
+    os.chmod(temp_path, entry["mode"] & 0o7777)
+    os.utime(temp_path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+    os.replace(temp_path, entry["source"])
+
+
+def restore_job(entries: List[Dict]) -> List[Optional[str]]:
+    """Restore the logged files stored in one compressed file or archive.
+    
+    All entries must share a destination.  A bundle is decompressed in a
+    single streaming pass that extracts every wanted member as it goes by.
+    Returns one error message (or None on success) per entry, in order.
+    """
+    first = entries[0]
+    errors: List[Optional[str]] = [None] * len(entries)
+    if not first.get("bundle"):
+        temp_path = _temp_path(first["source"])
+        try:
+            with open_compressed(first["destination"], first["codec"], 'rb') as src:
+                _restore(first, src, temp_path)
+        except Exception as e:
+            errors[0] = str(e)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return errors
+    
+    wanted = {os.path.basename(entry["source"]): i for i, entry in enumerate(entries)}
+    try:
+        with open_compressed(first["destination"], first["codec"], 'rb') as stream, \
+                tarfile.open(fileobj=stream, mode='r|') as tar:
+            for member in tar:
+                i = wanted.pop(member.name, None)
+                if i is None:
+                    continue
+                temp_path = _temp_path(entries[i]["source"])
+                try:
+                    with tar.extractfile(member) as src:
+                        _restore(entries[i], src, temp_path)
+                except Exception as e:
+                    errors[i] = str(e)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                if not wanted:
+                    break
+    except Exception as e:
+        for i in wanted.values():
+            errors[i] = str(e)
+        return errors
+    for name, i in wanted.items():
+        errors[i] = f"{name} not in {first['destination']}"
+    return errors
+
+
+class ColdStorage:
+    """Compresses aged files in place, or bundles them into per-directory archives.
+    
+    Candidates are files past ``min_age_days`` and at least ``min_size``
+    bytes, excluding formats that are already compressed.  Compression runs
+    on a process pool in on-disk order.  Every compressed file is recorded
+    under ``"tiering"`` in the operation log with its original mode and
+    mtime, so ``undo_last_tiering`` can restore it exactly.
+    """
+    
+    def __init__(self, file_logger: Optional[FileLogger] = None, codec: str = FileOrganizerConfig.TIER_CODEC,
+                 io_scheduler: Optional[IOScheduler] = None):
+        if codec not in CODECS:
+            raise ValueError(f"Unsupported codec '{codec}'; available: {', '.join(CODECS)}")
+        self.logger = file_logger or FileLogger()
+        self.codec = codec
+        self.io_scheduler = io_scheduler or IOScheduler()
+        # Destinations a run is about to create, so an interrupted run's unlogged copies can be found
+        self.intent_file = f"{self.logger.log_file}.tiering.pending"
+    
+    @staticmethod
+    def available_codecs() -> List[str]:
+        return list(CODECS)
+    
+    def select(self, directory: str, min_age_days: float = FileOrganizerConfig.TIER_MIN_AGE_DAYS,
+               min_size: int = FileOrganizerConfig.TIER_MIN_SIZE,
+               include_hidden: bool = False) -> List[Tuple[str, os.stat_result]]:
+        """Files below ``directory`` that the policy would move to cold storage."""
+        cutoff = time.time() - min_age_days * 86400
+        candidates = []
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if not include_hidden and FileUtils.is_hidden_file(entry.name):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                                continue
+                            if not entry.is_file(follow_symlinks=False) or \
+                                    os.path.splitext(entry.name)[1].lower() in INCOMPRESSIBLE:
+                                continue
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if st.st_mtime <= cutoff and st.st_size >= min_size and st.st_nlink == 1:
+                            candidates.append((entry.path, st))
+            except OSError as e:
+                self.logger.log_action("errors", current, error_msg=f"Tiering scan failed: {e}")
+        return candidates
+    
+    def _run(self, tasks: List[Tuple[Callable, tuple, List[Tuple[str, os.stat_result]], bool]],
+             progress: Optional[Callable[[int, int], None]]) -> Dict:
+        """Run (job, args, files, is_bundle) tasks on a process pool, logging results in batches.
+        
+        Tasks go through ``IOScheduler.map`` by their first file, so each
+        device has at most its own limit of tasks in flight while compression
+        runs in the pool.  Originals are only removed once their log entries
+        are confirmed written, so a crash leaves at worst a compressed copy
+        next to an intact original; if the log write fails the compressed
+        copies are removed instead.
+        """
+        summary = {"files": 0, "skipped": 0, "bytes_before": 0, "bytes_after": 0, "bytes_reclaimed": 0, "errors": []}
+        # (log entries, bytes before, bytes after) per finished task, not yet logged
+        pending: List[Tuple[List[Dict], int, int]] = []
+        
+        def flush() -> None:
+            entries = [entry for task_entries, _, _ in pending for entry in task_entries]
+            if not self.logger.log_batch("tiering", entries):
+                # Without an undo record the compressed copies are dropped and the originals kept
+                for destination in {entry["destination"] for entry in entries}:
+                    try:
+                        os.remove(destination)
+                    except OSError:
+                        pass
+                error_msg = f"Could not log {len(entries)} tiered files; their originals were kept"
+                summary["errors"].append(error_msg)
+                logger.error(error_msg)
+                pending.clear()
+                return
+            for entry in entries:
+                try:
+                    os.remove(entry["source"])
+                except OSError as e:
+                    self.logger.log_action("errors", entry["source"], error_msg=f"Could not remove tiered original: {e}")
+            for task_entries, size, compressed in pending:
+                summary["files"] += len(task_entries)
+                summary["bytes_before"] += size
+                summary["bytes_after"] += compressed
+            pending.clear()
+        
+        with process_pool(os.cpu_count() or 1) as executor:
+            done = 0
+            for (_, _, files, bundle), result, error in self.io_scheduler.map(
+                    lambda task: executor.submit(task[0], *task[1]).result(), tasks,
+                    lambda task: task[2][0][0], lambda task: task[2][0][1]):
+                done += 1
+                if error is not None:
+                    error_msg = f"Tiering failed for {files[0][0]}: {error}"
+                    summary["errors"].append(error_msg)
+                    self.logger.log_action("errors", files[0][0], error_msg=error_msg)
+                elif not result[0]:
+                    summary["skipped"] += len(files)
+                else:
+                    destination, size, compressed = result
+                    pending.append(([FileLogger.make_entry(path, destination, extra={
+                        "codec": self.codec, "bundle": bundle,
+                        "size": st.st_size, "mode": st.st_mode, "mtime_ns": st.st_mtime_ns,
+                    }) for path, st in files], size, compressed))
+                    if sum(len(task_entries) for task_entries, _, _ in pending) >= FileOrganizerConfig.TIER_LOG_BATCH:
+                        flush()
+                if progress is not None:
+                    progress(done, len(tasks))
+        flush()
+        summary["bytes_reclaimed"] = summary["bytes_before"] - summary["bytes_after"]
+        return summary
+    
+    def compress(self, candidates: List[Tuple[str, os.stat_result]], bundle: bool = False,
+                 progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Compress ``candidates`` file by file, or with ``bundle`` into one archive per directory."""
+        suffix = CODECS[self.codec]
+        if bundle:
+            # Members are archived in on-disk order
+            by_directory: Dict[str, List[Tuple[str, os.stat_result]]] = defaultdict(list)
+            for path, st in self.io_scheduler.order(candidates, lambda c: c[0], lambda c: c[1]):
+                by_directory[os.path.dirname(path)].append((path, st))
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            tasks = [(bundle_job, (directory, [os.path.basename(p) for p, _ in files], self.codec,
+                                   FileUtils.get_unique_filename(os.path.join(directory, f"coldstore-{stamp}.tar{suffix}"))),
+                      files, True)
+                     for directory, files in by_directory.items()]
+        else:
+            tasks = [(compress_job, (path, self.codec, FileUtils.get_unique_filename(path + suffix)), [(path, st)], False)
+                     for path, st in candidates]
+        
+        # Record every destination before it exists; the last argument of both jobs
+        self.discard_unlogged()
+        with open(self.intent_file, 'w') as intents:
+            intents.writelines(f"{args[-1]}\n" for _, args, _, _ in tasks)
+            intents.flush()
+            os.fsync(intents.fileno())
+        summary = self._run(tasks, progress)
+        os.remove(self.intent_file)
+        logger.info(f"Tiering ({self.codec}{', bundled' if bundle else ''}) compressed {summary['files']} files, "
+                    f"reclaimed {summary['bytes_reclaimed']:,} bytes")
+        return summary
+    
+    def run(self, directory: str, min_age_days: float = FileOrganizerConfig.TIER_MIN_AGE_DAYS,
+            min_size: int = FileOrganizerConfig.TIER_MIN_SIZE, bundle: bool = False,
+            include_hidden: bool = False, progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Select files under ``directory`` by policy and move them to cold storage."""
+        return self.compress(self.select(directory, min_age_days, min_size, include_hidden), bundle, progress)
+    
+    def discard_unlogged(self, data: Optional[Dict[str, List[Dict]]] = None) -> int:
+        """Remove compressed copies an interrupted run created but never logged; returns how many.
+        
+        Their originals were never removed, so nothing is lost.
+        """
+        if not os.path.exists(self.intent_file):
+            return 0
+        if data is None:
+            data = self.logger.load()
+        logged = {entry["destination"] for entry in data.get("tiering", [])}
+        removed = 0
+        with open(self.intent_file, 'r') as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # torn final line from a crash
+                destination = line[:-1]
+                if destination not in logged and os.path.isfile(destination):
+                    os.remove(destination)
+                    removed += 1
+        os.remove(self.intent_file)
+        if removed:
+            logger.info(f"Removed {removed} unlogged cold-storage copies left by an interrupted run")
+        return removed
+    
+    def undo_last_tiering(self) -> Tuple[bool, str]:
+        """Decompress every file recorded in the tiering log and remove emptied archives.
+        
+        Compressed copies an interrupted run made but never logged are
+        removed first; their originals are still in place.
+        """
+        try:
+            data = self.logger.load()
+            self.logger.recover_undo_journal(data, "tiering")
+            self.discard_unlogged(data)
+            entries = data.get("tiering", [])
+            if not entries:
+                return False, "No cold-storage actions found to undo."
+            
+            # One task per compressed file or archive, so each bundle is read once
+            by_destination: Dict[str, List[Dict]] = defaultdict(list)
+            for entry in entries:
+                by_destination[entry["destination"]].append(entry)
+            
+            restored = 0
+            failed = set()
+            with self.logger.open_undo_journal("tiering") as journal, process_pool(os.cpu_count() or 1) as executor:
+                futures = {executor.submit(restore_job, group): group for group in by_destination.values()}
+                for future in as_completed(futures):
+                    group = futures[future]
+                    try:
+                        errors = future.result()
+                    except Exception as e:
+                        errors = [str(e)] * len(group)
+                    for entry, error in zip(group, errors):
+                        if error is not None:
+                            logger.error(f"Failed to restore {entry['source']}: {error}")
+                            failed.add(id(entry))
+                            continue
+                        self.logger.journal_entry(journal, entry)
+                        restored += 1
+            
+            # A compressed file or archive goes once nothing recorded in it is left to restore
+            remaining = [entry for entry in entries if id(entry) in failed]
+            still_needed = {entry["destination"] for entry in remaining}
+            for destination in {entry["destination"] for entry in entries} - still_needed:
+                if os.path.exists(destination):
+                    os.remove(destination)
+            
+            self.logger.commit_undo(data, remaining, "tiering")
+            message = f"Restored {restored} files from cold storage."
+            if remaining:
+                message += f" {len(remaining)} could not be restored."
+            return True, message
+        except Exception as e:
+            logger.error(f"Error during tiering undo: {e}")
+            return False, f"Error during tiering undo: {str(e)}"
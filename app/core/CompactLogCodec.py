@@ -0,0 +1,249 @@
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+
+
+class CompactLogCodec:
+    """Binary encoding of the operation log with interned directory prefixes.
+    
+    The file is a magic header followed by a stream of records.  Directory
+    prefixes and action names are declared once in table records and every
+    entry references them by integer ID, storing only the basename and an
+    integer epoch timestamp.  Source basenames are front-coded against the
+    previous entry's, and a destination that keeps the source basename is a
+    single flag bit.  Records only depend on earlier ones, so new entries can
+    be appended without rewriting the file.
+    """
+    
+    MAGIC = b"FOLOG\x01"
+    
+    TAG_DIR = 0x01
+    TAG_ACTION = 0x02
+    TAG_ENTRY = 0x03
+    
+    HAS_DESTINATION = 0x01
+    HAS_ERROR = 0x02
+    HAS_EXTRA = 0x04
+    SAME_BASENAME = 0x08
+    
+    STANDARD_KEYS = ("timestamp", "source", "destination", "error")
+    
+    def __init__(self):
+        self.directories: Dict[str, int] = {}
+        self.actions: Dict[str, int] = {}
+        self.valid_length = len(self.MAGIC)
+        self.last_basename = ""
+    
+    def reset(self) -> None:
+        """Forget the intern tables, e.g. when they may no longer match the file."""
+        self.directories.clear()
+        self.actions.clear()
+        self.valid_length = len(self.MAGIC)
+        self.last_basename = ""
+    
+    @staticmethod
+    def is_compact(header: bytes) -> bool:
+        """Check whether a file header belongs to a compact log."""
+        return header.startswith(CompactLogCodec.MAGIC)
+    
+    @staticmethod
+    def split_path(path: str) -> Tuple[str, str]:
+        """Split a path into (prefix incl. trailing separator, basename), for any OS."""
+        index = max(path.rfind('/'), path.rfind('\\'))
+        return path[:index + 1], path[index + 1:]
+    
+    @staticmethod
+    def _varint(value: int) -> bytes:
+        out = bytearray()
+        while value > 0x7F:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+        return bytes(out)
+    
+    @classmethod
+    def _string(cls, value: str) -> bytes:
+        raw = value.encode('utf-8', 'surrogatepass')
+        return cls._varint(len(raw)) + raw
+    
+    @staticmethod
+    def _to_epoch(entry: Dict) -> int:
+        if "epoch" in entry:
+            return int(entry["epoch"])
+        try:
+            parsed = datetime.strptime(entry["timestamp"], FileOrganizerConfig.DATE_FORMAT)
+            return int(time.mktime(parsed.timetuple()))
+        except (KeyError, TypeError, ValueError):
+            return int(time.time())
+    
+    @staticmethod
+    def _common_prefix(previous: str, current: str) -> int:
+        limit = min(len(previous), len(current))
+        index = 0
+        while index < limit and previous[index] == current[index]:
+            index += 1
+        return index
+    
+    def _intern(self, table: Dict[str, int], tag: int, value: str, out: bytearray) -> int:
+        ident = table.get(value)
+        if ident is None:
+            ident = len(table)
+            table[value] = ident
+            out.append(tag)
+            out += self._varint(ident)
+            out += self._string(value)
+        return ident
+    
+    def encode_entry(self, action_type: str, entry: Dict) -> bytes:
+        """Encode one entry, emitting any table records it needs first."""
+        out = bytearray()
+        action_id = self._intern(self.actions, self.TAG_ACTION, action_type, out)
+        src_dir, src_base = self.split_path(entry["source"])
+        src_id = self._intern(self.directories, self.TAG_DIR, src_dir, out)
+        
+        destination = entry.get("destination")
+        error = entry.get("error")
+        extra = {k: v for k, v in entry.items() if k not in self.STANDARD_KEYS and k != "epoch"}
+        
+        flags = 0
+        if destination is not None:
+            flags |= self.HAS_DESTINATION
+            dst_dir, dst_base = self.split_path(destination)
+            dst_id = self._intern(self.directories, self.TAG_DIR, dst_dir, out)
+            if dst_base == src_base:
+                flags |= self.SAME_BASENAME
+        if error is not None:
+            flags |= self.HAS_ERROR
+        if extra:
+            flags |= self.HAS_EXTRA
+        
+        out.append(self.TAG_ENTRY)
+        out += self._varint(action_id)
+        out += self._varint(flags)
+        out += self._varint(self._to_epoch(entry))
+        out += self._varint(src_id)
+        shared = self._common_prefix(self.last_basename, src_base)
+        out += self._varint(shared)
+        out += self._string(src_base[shared:])
+        self.last_basename = src_base
+        if destination is not None:
+            out += self._varint(dst_id)
+            if not flags & self.SAME_BASENAME:
+                out += self._string(dst_base)
+        if error is not None:
+            out += self._string(error)
+        if extra:
+            out += self._string(json.dumps(extra, separators=(',', ':')))
+        return bytes(out)
+    
+    def encode(self, data: Dict[str, List[Dict]]) -> bytes:
+        """Encode a whole log, resetting the intern tables."""
+        self.reset()
+        out = bytearray(self.MAGIC)
+        for action_type, entries in data.items():
+            # Declare empty sections too so they survive a round trip
+            self._intern(self.actions, self.TAG_ACTION, action_type, out)
+            for entry in entries:
+                out += self.encode_entry(action_type, entry)
+        self.valid_length = len(out)
+        return bytes(out)
+    
+    def decode(self, blob: bytes) -> Dict[str, List[Dict]]:
+        """Decode a compact log, rebuilding the intern tables for later appends.
+        
+        A final record cut short by an interrupted append is skipped and
+        ``valid_length`` points before it, so the next append overwrites it.
+        Anything else that does not decode raises ValueError, since dropping
+        it would lose the records after it.
+        """
+        if not self.is_compact(blob):
+            raise ValueError("Not a compact operation log")
+        
+        directories: List[str] = []
+        actions: List[str] = []
+        data: Dict[str, List[Dict]] = {}
+        timestamps: Dict[int, str] = {}
+        last_basename = ""
+        view = memoryview(blob)
+        pos = len(self.MAGIC)
+        end = len(blob)
+        
+        def varint() -> int:
+            nonlocal pos
+            result = shift = 0
+            while True:
+                if pos >= end:
+                    raise EOFError("truncated varint")
+                byte = blob[pos]
+                pos += 1
+                result |= (byte & 0x7F) << shift
+                if byte < 0x80:
+                    return result
+                shift += 7
+        
+        def string() -> str:
+            nonlocal pos
+            length = varint()
+            if pos + length > end:
+                raise EOFError("truncated string")
+            value = str(view[pos:pos + length], 'utf-8', 'surrogatepass')
+            pos += length
+            return value
+        
+        def lookup(table: List[str], kind: str) -> str:
+            ident = varint()
+            if ident >= len(table):
+                raise ValueError(f"Corrupt operation log: undeclared {kind} ID {ident} in record at byte {record_start}")
+            return table[ident]
+        
+        record_start = pos
+        while pos < end:
+            try:
+                tag = blob[pos]
+                pos += 1
+                if tag == self.TAG_DIR:
+                    varint()
+                    directories.append(string())
+                elif tag == self.TAG_ACTION:
+                    varint()
+                    actions.append(string())
+                    data.setdefault(actions[-1], [])
+                elif tag == self.TAG_ENTRY:
+                    action = lookup(actions, "action")
+                    flags = varint()
+                    epoch = varint()
+                    timestamp = timestamps.get(epoch)
+                    if timestamp is None:
+                        timestamp = datetime.fromtimestamp(epoch).strftime(FileOrganizerConfig.DATE_FORMAT)
+                        timestamps[epoch] = timestamp
+                    src_dir = lookup(directories, "directory")
+                    shared = varint()
+                    basename = last_basename[:shared] + string()
+                    source = src_dir + basename
+                    destination: Optional[str] = None
+                    error: Optional[str] = None
+                    if flags & self.HAS_DESTINATION:
+                        dst_dir = lookup(directories, "directory")
+                        destination = dst_dir + (basename if flags & self.SAME_BASENAME else string())
+                    if flags & self.HAS_ERROR:
+                        error = string()
+                    entry = {"timestamp": timestamp, "source": source, "destination": destination, "error": error}
+                    if flags & self.HAS_EXTRA:
+                        entry.update(json.loads(string()))
+                    data[action].append(entry)
+                    last_basename = basename
+                else:
+                    raise ValueError(f"Corrupt operation log: unknown record tag {tag:#x} at byte {pos - 1}")
+            except EOFError:
+                # Ran out of bytes mid-record: a torn final record from an interrupted append
+                break
+            record_start = pos
+        
+        self.directories = {d: i for i, d in enumerate(directories)}
+        self.actions = {a: i for i, a in enumerate(actions)}
+        self.valid_length = record_start
+        self.last_basename = last_basename
+        return data
@@ -0,0 +1,229 @@
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+from app.core.DuplicateFinder import DuplicateGroup
+from app.core.FileLogger import FileLogger
+from app.core.FileUtils import FileUtils
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# ioctl number of FICLONE on Linux (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+
+class DedupExecutor:
+    """Reclaims space from duplicate groups by hard-linking, reflinking or deleting copies.
+    
+    For every group one inode is kept according to a keep-policy.  Every
+    other inode is compared byte for byte with the keeper before it is
+    touched, and each replaced path is recorded under ``"dedup"`` in the
+    operation log so ``undo_last_dedup`` can restore an independent copy.
+    """
+    
+    ACTIONS = ("hardlink", "reflink", "delete")
+    KEEP_POLICIES = ("oldest", "newest", "shortest_path", "first")
+    
+    def __init__(self, file_logger: Optional[FileLogger] = None,
+                 max_workers: int = FileOrganizerConfig.DEDUP_MAX_WORKERS):
+        self.logger = file_logger or FileLogger()
+        self.utils = FileUtils()
+        self.max_workers = max_workers
+    
+    def choose_keeper(self, group: DuplicateGroup, keep: str) -> int:
+        """Return the index in ``group.inodes`` of the inode to keep."""
+        if keep not in self.KEEP_POLICIES:
+            raise ValueError(f"Unknown keep policy '{keep}'; expected one of {', '.join(self.KEEP_POLICIES)}")
+        if keep == "first":
+            return 0
+        if keep == "shortest_path":
+            return min(range(len(group.inodes)), key=lambda i: min(len(p) for p in group.inodes[i]))
+        
+        mtimes = []
+        for index, links in enumerate(group.inodes):
+            try:
+                mtimes.append((os.stat(links[0]).st_mtime_ns, index))
+            except OSError:
+                continue
+        if not mtimes:
+            return 0
+        return (min(mtimes) if keep == "oldest" else max(mtimes))[1]
+    
+    def plan(self, groups: Iterable[DuplicateGroup], keep: str = "oldest") -> List[Tuple[str, List[str], int]]:
+        """List (keeper path, paths of one duplicate inode, size) for every inode to replace."""
+        tasks = []
+        for group in groups:
+            keeper = self.choose_keeper(group, keep)
+            keep_path = group.inodes[keeper][0]
+            for index, links in enumerate(group.inodes):
+                if index != keeper:
+                    tasks.append((keep_path, links, group.size))
+        return tasks
+    
+    @staticmethod
+    def _temp_path(path: str) -> str:
+        return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.dedup-tmp")
+    
+    @staticmethod
+    def _reflink(source: str, destination: str) -> None:
+        """Create ``destination`` as a copy-on-write clone of ``source`` (btrfs, xfs)."""
+        if not sys.platform.startswith("linux"):
+            raise OSError("Reflinks are only supported on Linux")
+        import fcntl
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    
+    def _verify_inode(self, keep_path: str, links: List[str], action: str) -> List[Dict]:
+        """Verify one duplicate inode against the keeper and return a log entry per path to replace."""
+        if not self.utils.files_identical(keep_path, links[0]):
+            raise ValueError(f"{links[0]} no longer matches {keep_path}; skipped")
+        if action == "hardlink" and os.stat(keep_path).st_dev != os.stat(links[0]).st_dev:
+            raise OSError(f"Cannot hard-link across devices: {links[0]}")
+        entries = []
+        for path in links:
+            st = os.stat(path)
+            entries.append(FileLogger.make_entry(path, keep_path, extra={
+                "action": action, "size": st.st_size, "mode": st.st_mode, "mtime_ns": st.st_mtime_ns,
+            }))
+        return entries
+    
+    def _replace(self, entry: Dict) -> None:
+        """Replace the duplicate path described by an already logged ``entry``."""
+        path, keep_path, action = entry["source"], entry["destination"], entry["action"]
+        st = os.stat(path)
+        if (st.st_size, st.st_mtime_ns) != (entry["size"], entry["mtime_ns"]):
+            raise ValueError(f"{path} changed since it was verified; skipped")
+        
+        if action == "delete":
+            os.remove(path)
+            return
+        
+        temp_path = self._temp_path(path)
+        try:
+            if action == "hardlink":
+                os.link(keep_path, temp_path)
+            else:
+                self._reflink(keep_path, temp_path)
+                shutil.copystat(path, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    def execute(self, groups: Iterable[DuplicateGroup], action: str = "hardlink", keep: str = "oldest") -> Dict:
+        """Apply ``action`` to every duplicate in ``groups`` in parallel and journal it.
+        
+        Inodes are verified in parallel; verified paths are logged in batches
+        and only replaced once their batch is written, so every destructive
+        step has an undo record first.  A path whose replacement then fails
+        stays in the log, where undo just rewrites an identical copy.
+        """
+        if action not in self.ACTIONS:
+            raise ValueError(f"Unknown dedup action '{action}'; expected one of {', '.join(self.ACTIONS)}")
+        
+        tasks = self.plan(groups, keep)
+        summary = {"replaced": 0, "bytes_reclaimed": 0, "errors": []}
+        pending: List[Tuple[List[Dict], int]] = []
+        replacing = {}
+        # Paths of each inode still to replace; its bytes count once all of them are done
+        outstanding: Dict[str, int] = {}
+        
+        def error(path: str, error_msg: str) -> None:
+            summary["errors"].append(error_msg)
+            self.logger.log_action("errors", path, error_msg=error_msg)
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def flush() -> None:
+                entries = [entry for inode_entries, _ in pending for entry in inode_entries]
+                if not self.logger.log_batch("dedup", entries):
+                    for inode_entries, _ in pending:
+                        error(inode_entries[0]["source"], f"Could not log dedup of {inode_entries[0]['source']}; left untouched")
+                else:
+                    for inode_entries, size in pending:
+                        outstanding[inode_entries[0]["source"]] = len(inode_entries)
+                        for entry in inode_entries:
+                            replacing[executor.submit(self._replace, entry)] = (entry, inode_entries[0]["source"], size)
+                pending.clear()
+            
+            futures = {executor.submit(self._verify_inode, keep_path, links, action): (links, size)
+                       for keep_path, links, size in tasks}
+            for future in as_completed(futures):
+                links, size = futures[future]
+                try:
+                    pending.append((future.result(), size))
+                except Exception as e:
+                    error(links[0], f"Dedup failed for {links[0]}: {e}")
+                    continue
+                if sum(len(entries) for entries, _ in pending) >= FileOrganizerConfig.DEDUP_LOG_BATCH:
+                    flush()
+            flush()
+            
+            for future in as_completed(replacing):
+                entry, inode, size = replacing[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    error(entry["source"], f"Dedup failed for {entry['source']}: {e}")
+                    outstanding[inode] = -1
+                    continue
+                summary["replaced"] += 1
+                outstanding[inode] -= 1
+                if outstanding[inode] == 0:
+                    summary["bytes_reclaimed"] += size
+        
+        logger.info(f"Dedup ({action}) replaced {summary['replaced']} files, "
+                    f"reclaimed {summary['bytes_reclaimed']:,} bytes")
+        return summary
+    
+    @staticmethod
+    def _restore(entry: Dict) -> None:
+        """Turn a deduplicated path back into an independent copy of the kept file."""
+        path, keep_path = entry["source"], entry["destination"]
+        temp_path = DedupExecutor._temp_path(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        shutil.copyfile(keep_path, temp_path)
+        os.chmod(temp_path, entry["mode"] & 0o7777)
+        os.utime(temp_path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+        os.replace(temp_path, path)
+    
+    def undo_last_dedup(self) -> Tuple[bool, str]:
+        """Restore every path recorded in the dedup log from its kept copy."""
+        try:
+            data = self.logger.load()
+            self.logger.recover_undo_journal(data, "dedup")
+            entries = data.get("dedup", [])
+            if not entries:
+                return False, "No deduplication actions found to undo."
+            
+            restored = 0
+            remaining = []
+            with self.logger.open_undo_journal("dedup") as journal, \
+                    ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(self._restore, entry): entry for entry in entries}
+                for future in as_completed(futures):
+                    entry = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"Failed to restore {entry['source']}: {e}")
+                        remaining.append(entry)
+                        continue
+                    self.logger.journal_entry(journal, entry)
+                    restored += 1
+            
+            failed = {id(entry) for entry in remaining}
+            self.logger.commit_undo(data, [e for e in entries if id(e) in failed], "dedup")
+            message = f"Restored {restored} deduplicated files."
+            if remaining:
+                message += f" {len(remaining)} could not be restored."
+            return True, message
+        except Exception as e:
+            logger.error(f"Error during dedup undo: {e}")
+            return False, f"Error during dedup undo: {str(e)}"
@@ -0,0 +1,78 @@
+import os
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+
+
+@dataclass(frozen=True)
+class ListingEntry:
+    name: str
+    path: str
+    is_dir: bool
+    size: Optional[int]  # None for directories and files that could not be stat'ed
+
+
+class DirectoryListing:
+    """Sorted, paginated view of one directory's entries.
+    
+    A single ``scandir`` pass records names and entry types (from the
+    directory entries themselves, no per-file stat); names are sorted once by
+    a case-insensitive key, and sizes are only looked up for entries on a
+    page that is actually shown, then cached.  ``find`` locates a name by
+    binary search over the same keys.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime_ns = os.stat(path).st_mtime_ns
+        scanned = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                scanned.append((entry.name.casefold(), entry.name, is_dir))
+        scanned.sort()
+        self._keys = [key for key, _, _ in scanned]
+        self._names = [name for _, name, _ in scanned]
+        self._is_dir = [is_dir for _, _, is_dir in scanned]
+        self._sizes: Dict[int, Optional[int]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._names)
+    
+    def is_stale(self) -> bool:
+        """Whether entries were added, removed or renamed since the scan."""
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime_ns
+        except OSError:
+            return True
+    
+    def page_count(self, page_size: int = FileOrganizerConfig.PREVIEW_PAGE_SIZE) -> int:
+        return max(1, -(-len(self) // page_size))
+    
+    def _size(self, index: int) -> Optional[int]:
+        if index not in self._sizes:
+            try:
+                self._sizes[index] = None if self._is_dir[index] else \
+                    os.path.getsize(os.path.join(self.path, self._names[index]))
+            except OSError:
+                self._sizes[index] = None
+        return self._sizes[index]
+    
+    def page(self, number: int, page_size: int = FileOrganizerConfig.PREVIEW_PAGE_SIZE) -> List[ListingEntry]:
+        """Entries on page ``number`` (0-based)."""
+        start = number * page_size
+        return [ListingEntry(self._names[i], os.path.join(self.path, self._names[i]), self._is_dir[i], self._size(i))
+                for i in range(start, min(start + page_size, len(self)))]
+    
+    def find(self, name: str) -> int:
+        """Index of the first entry sorting at or after ``name``, clamped to the last entry."""
+        return min(bisect_left(self._keys, name.casefold()), max(0, len(self) - 1))
+    
+    def page_of(self, name: str, page_size: int = FileOrganizerConfig.PREVIEW_PAGE_SIZE) -> int:
+        """Page (0-based) that shows ``name`` or where it would sort."""
+        return self.find(name) // page_size
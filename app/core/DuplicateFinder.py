@@ -0,0 +1,296 @@
+import os
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+from app.core.FileLogger import FileLogger
+from app.core.FileUtils import FileUtils
+from app.core.HashCache import HashCache
+from app.core.HashScheduler import HashJob, HashScheduler
+from app.core.IOScheduler import IOScheduler
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+FileEntry = Tuple[str, os.stat_result]
+# progress(stage, done, total) with stage "sizing", "partial" or "full"; total is 0 while sizing
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class FileRecord(NamedTuple):
+    """One inode: the path it is hashed through and every hard link to it."""
+    path: str
+    st: os.stat_result
+    paths: List[str]
+    root: str = ""
+
+
+class DuplicateGroup(NamedTuple):
+    """Distinct inodes with identical content; ``inodes`` lists the paths of each.
+    
+    ``roots`` runs parallel to ``inodes`` and names the scan root each inode
+    was found under.
+    """
+    digest: str
+    size: int
+    inodes: List[List[str]]
+    roots: Tuple[str, ...] = ()
+    
+    @property
+    def paths(self) -> List[str]:
+        return sorted(path for links in self.inodes for path in links)
+    
+    @property
+    def reclaimable_bytes(self) -> int:
+        """Space freed by keeping a single inode; extra hard links cost nothing."""
+        return self.size * (len(self.inodes) - 1)
+    
+    @property
+    def spans_roots(self) -> bool:
+        return len(set(self.roots)) > 1
+    
+    def paths_by_root(self) -> Dict[str, List[str]]:
+        """Group the paths of every copy under the root it lives in."""
+        by_root: Dict[str, List[str]] = defaultdict(list)
+        for root, links in zip(self.roots, self.inodes):
+            by_root[root].extend(links)
+        return dict(by_root)
+
+
+class DuplicateFinder:
+    """Finds duplicate files with a staged size -> partial hash -> full hash pipeline.
+    
+    Only files sharing a size are read at all, only the first and last
+    ``PARTIAL_HASH_SIZE`` bytes are read for them, and only files whose
+    partial hashes still collide are hashed in full.  Hard links are
+    collapsed by (st_dev, st_ino) first, so each inode is hashed once and
+    never reported as its own duplicate.  Cache misses are streamed to an
+    adaptive ``HashScheduler`` in the on-disk order chosen by ``IOScheduler``.
+    Both hash stages go through the persistent ``HashCache`` when one is
+    available, so unchanged files are not read again on the next scan.
+    """
+    
+    def __init__(self, file_logger: Optional[FileLogger] = None, hash_cache: Optional[HashCache] = None,
+                 algorithm: str = FileOrganizerConfig.DUPLICATE_HASH_ALGORITHM,
+                 scheduler: Optional[HashScheduler] = None, io_scheduler: Optional[IOScheduler] = None):
+        self.logger = file_logger or FileLogger()
+        self.utils = FileUtils()
+        self.hash_cache = hash_cache
+        algorithm = self.utils.resolve_hash_algorithm(algorithm)
+        self.utils.get_hasher(algorithm)  # fail fast on an unknown backend
+        self.algorithm = algorithm
+        self.scheduler = scheduler or HashScheduler()
+        self.io_scheduler = io_scheduler or IOScheduler()
+        self.stats: Dict[str, int] = defaultdict(int)
+    
+    def scan(self, directory: str, include_hidden: bool = False) -> Iterator[FileEntry]:
+        """Yield (path, stat) for every regular file below ``directory``."""
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if not include_hidden and self.utils.is_hidden_file(entry.name):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                yield entry.path, entry.stat(follow_symlinks=False)
+                        except OSError as e:
+                            self.logger.log_action("errors", entry.path, error_msg=f"Scan failed: {e}")
+            except OSError as e:
+                self.logger.log_action("errors", current, error_msg=f"Scan failed: {e}")
+    
+    def _collect_inodes(self, files: Iterable[FileEntry], root: str, inodes: Dict[Tuple[int, int], FileRecord],
+                        progress: Optional[ProgressCallback] = None,
+                        cancel: Optional[threading.Event] = None) -> None:
+        """Add the files of one root to ``inodes``, collapsing hard links by (st_dev, st_ino)."""
+        for path, st in files:
+            self.stats["files_scanned"] += 1
+            if self.stats["files_scanned"] % 1000 == 0:
+                if cancel is not None and cancel.is_set():
+                    return
+                if progress is not None:
+                    progress("sizing", self.stats["files_scanned"], 0)
+            # Empty files are trivially identical and reclaim nothing
+            if st.st_size == 0:
+                continue
+            record = inodes.get((st.st_dev, st.st_ino))
+            if record is not None:
+                record.paths.append(path)
+                self.stats["hardlinks_collapsed"] += 1
+                continue
+            self.stats["bytes_scanned"] += st.st_size
+            inodes[(st.st_dev, st.st_ino)] = FileRecord(path, st, [path], root)
+    
+    @staticmethod
+    def _spans_roots(records: List[FileRecord]) -> bool:
+        return len({record.root for record in records}) > 1
+    
+    def _bucket_by_size(self, inodes: Iterable[FileRecord], cross_root_only: bool = False) -> Dict[int, List[FileRecord]]:
+        buckets = defaultdict(list)
+        for record in inodes:
+            buckets[record.st.st_size].append(record)
+        return {size: records for size, records in buckets.items()
+                if len(records) > 1 and (not cross_root_only or self._spans_roots(records))}
+    
+    def group_by_size(self, files: Iterable[FileEntry]) -> Dict[int, List[FileRecord]]:
+        """Stage 1: collapse hard links, then bucket inodes by size keeping only buckets that can hold duplicates."""
+        inodes: Dict[Tuple[int, int], FileRecord] = {}
+        self._collect_inodes(files, "", inodes)
+        return self._bucket_by_size(inodes.values())
+    
+    @staticmethod
+    def normalize_roots(roots: Iterable[str]) -> List[str]:
+        """Absolute, de-duplicated roots with any root nested inside another dropped."""
+        normalized = sorted({os.path.abspath(root) for root in roots})
+        kept: List[str] = []
+        for root in normalized:
+            if not any(os.path.commonpath([root, parent]) == parent for parent in kept):
+                kept.append(root)
+        return kept
+    
+    def _hash_stage(self, candidates: Dict[int, List[FileRecord]], stage: str,
+                    progress: Optional[ProgressCallback] = None,
+                    cancel: Optional[threading.Event] = None) -> Iterator[Tuple[int, Dict[str, List[FileRecord]]]]:
+        """Hash every candidate, yielding (size, colliding digest -> records) as each size bucket completes."""
+        groups: Dict[int, Dict[str, List[FileRecord]]] = defaultdict(lambda: defaultdict(list))
+        remaining = {size: len(records) for size, records in candidates.items()}
+        total = sum(remaining.values())
+        done = 0
+        
+        def collisions(size: int) -> Dict[str, List[FileRecord]]:
+            return {digest: records for digest, records in groups.pop(size, {}).items() if len(records) > 1}
+        
+        # Cache hits are resolved up front so only misses reach the workers
+        misses = []
+        for size, records in candidates.items():
+            for record in records:
+                cached = self.hash_cache.get(record.st, stage, self.algorithm) if self.hash_cache else None
+                if cached is None:
+                    misses.append(record)
+                    continue
+                self.stats[f"{stage}_cache_hits"] += 1
+                self.stats[f"{stage}_hashed"] += 1
+                groups[size][cached].append(record)
+                remaining[size] -= 1
+                done += 1
+        if progress is not None:
+            progress(stage, done, total)
+        for size in [size for size, count in remaining.items() if count == 0]:
+            yield size, collisions(size)
+        
+        # Read in on-disk order so spinning disks are swept rather than seeked
+        misses = self.io_scheduler.order(misses, lambda r: r.path, lambda r: r.st)
+        records_by_path = {record.path: record for record in misses}
+        jobs = (HashJob(record.path, record.st.st_size, stage, self.algorithm,
+                        FileOrganizerConfig.PARTIAL_HASH_SIZE, record.st.st_dev) for record in misses)
+        
+        results = self.scheduler.run(jobs, self.io_scheduler)
+        try:
+            for job, digest in results:
+                if cancel is not None and cancel.is_set():
+                    return
+                record = records_by_path.pop(job.path)
+                if digest.startswith("ERROR"):
+                    self.logger.log_action("errors", job.path, error_msg=f"Hashing failed: {digest}")
+                else:
+                    if self.hash_cache is not None:
+                        self.hash_cache.put(record.st, digest, stage, self.algorithm)
+                    self.stats["bytes_read"] += job.bytes_to_read
+                    self.stats[f"{stage}_hashed"] += 1
+                    groups[job.size][digest].append(record)
+                done += 1
+                remaining[job.size] -= 1
+                if progress is not None:
+                    progress(stage, done, total)
+                if remaining[job.size] == 0:
+                    yield job.size, collisions(job.size)
+        finally:
+            results.close()
+    
+    @staticmethod
+    def _make_group(digest: str, size: int, records: List[FileRecord]) -> DuplicateGroup:
+        ordered = sorted((sorted(record.paths), record.root) for record in records)
+        return DuplicateGroup(digest, size, [links for links, _ in ordered], tuple(root for _, root in ordered))
+    
+    def find(self, directory: str, include_hidden: bool = False) -> Dict[str, List[str]]:
+        """Find duplicate files below ``directory``, keyed by full-content digest."""
+        return {group.digest: group.paths for group in self.find_groups(directory, include_hidden)}
+    
+    def find_groups(self, directory: str, include_hidden: bool = False) -> List[DuplicateGroup]:
+        """Find duplicate inodes below ``directory``, largest reclaimable space first."""
+        return self.find_groups_across([directory], include_hidden)
+    
+    def find_groups_across(self, roots: Sequence[str], include_hidden: bool = False,
+                           cross_root_only: bool = False) -> List[DuplicateGroup]:
+        """Find duplicate inodes below any of ``roots``, largest reclaimable space first."""
+        duplicates = list(self.iter_groups_across(roots, include_hidden, cross_root_only))
+        duplicates.sort(key=lambda group: group.reclaimable_bytes, reverse=True)
+        return duplicates
+    
+    def iter_groups_across(self, roots: Sequence[str], include_hidden: bool = False, cross_root_only: bool = False,
+                           progress: Optional[ProgressCallback] = None,
+                           cancel: Optional[threading.Event] = None) -> Iterator[DuplicateGroup]:
+        """Yield duplicate groups below any of ``roots`` as soon as each one is confirmed.
+        
+        Size buckets are merged across every root (and volume) before anything
+        is hashed.  A group is emitted once every candidate of its size has
+        been hashed in the deciding stage: small files during the partial
+        stage, larger ones during the full stage.  With ``cross_root_only``
+        only groups with copies in more than one root are kept, and candidates
+        confined to a single root are dropped after each stage instead of
+        being read further.  Setting ``cancel`` (or closing the iterator)
+        stops the scan and its workers.
+        """
+        edge = FileOrganizerConfig.PARTIAL_HASH_SIZE
+        self.stats = defaultdict(int)
+        roots = self.normalize_roots(roots)
+        
+        def cancelled() -> bool:
+            return cancel is not None and cancel.is_set()
+        
+        try:
+            inodes: Dict[Tuple[int, int], FileRecord] = {}
+            for root in roots:
+                self._collect_inodes(self.scan(root, include_hidden), root, inodes, progress, cancel)
+            if progress is not None:
+                progress("sizing", self.stats["files_scanned"], self.stats["files_scanned"])
+            by_size = self._bucket_by_size(inodes.values(), cross_root_only)
+            
+            # Stage 2: cheap hash of the head and tail of each candidate;
+            # small files are hashed in full by it already
+            needs_full: Dict[int, List[FileRecord]] = defaultdict(list)
+            for size, by_digest in ([] if cancelled() else self._hash_stage(by_size, "partial", progress, cancel)):
+                for digest, records in by_digest.items():
+                    if cross_root_only and not self._spans_roots(records):
+                        continue
+                    if size > 2 * edge:
+                        needs_full[size].extend(records)
+                        continue
+                    group = self._make_group(digest, size, records)
+                    self.stats["reclaimable_bytes"] += group.reclaimable_bytes
+                    yield group
+            
+            # Stage 3: full hash only for files that still collide
+            for size, by_digest in ([] if cancelled() else self._hash_stage(needs_full, "full", progress, cancel)):
+                for digest, records in by_digest.items():
+                    if cross_root_only and not self._spans_roots(records):
+                        continue
+                    group = self._make_group(digest, size, records)
+                    self.stats["reclaimable_bytes"] += group.reclaimable_bytes
+                    yield group
+        finally:
+            if self.hash_cache is not None:
+                self.hash_cache.flush()
+            logger.info(
+                f"Duplicate scan of {', '.join(roots)}{' (cancelled)' if cancelled() else ''}: "
+                f"{self.stats['files_scanned']} files, "
+                f"read {self.stats['bytes_read']:,} of {self.stats['bytes_scanned']:,} bytes, "
+                f"{self.stats['reclaimable_bytes']:,} bytes reclaimable"
+            )
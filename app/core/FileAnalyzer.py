@@ -1,30 +1,99 @@
+import heapq
 import os
+import time
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 from app.core.FileUtils import FileUtils
 from app.config.FileOrganiserConfig import FileOrganizerConfig
 
+# (label, upper bound in days), youngest first; the last range is open-ended
+AGE_RANGES: Tuple[Tuple[str, float], ...] = (
+    ('Last 24 hours', 1), ('Last week', 7), ('Last month', 30), ('Last year', 365), ('Older', float('inf')),
+)
+
+
+class StorageAnalysis(NamedTuple):
+    """Raw numbers behind the analytics dashboard, as parallel arrays ready for charting.
+    
+    ``bytes_by_category[i]`` and ``files_by_category[i]`` belong to
+    ``categories[i]``; ``files_by_age[i]`` to ``age_ranges[i]``.  Sizes are in
+    bytes; formatting is left to whoever displays them.
+    """
+    categories: Tuple[str, ...]
+    bytes_by_category: Tuple[int, ...]
+    files_by_category: Tuple[int, ...]
+    age_ranges: Tuple[str, ...]
+    files_by_age: Tuple[int, ...]
+    largest_files: Tuple[Tuple[str, int], ...]  # (path, bytes), largest first
+    total_bytes: int
+    total_files: int
+
+
 class FileAnalyzer:
     """Analyzes file organization and generates reports."""
     
     def __init__(self):
         self.file_utils = FileUtils()
     
-    def analyze_storage_usage(self, directory: str) -> Dict[str, float]:
-        """Analyze storage usage by category."""
-        usage_by_category = {category: 0 for category in FileOrganizerConfig.EXTENSIONS_MAPPING.keys()}
+    def analyze(self, directory: str, top_files: int = 10,
+                progress: Optional[Callable[[int], None]] = None) -> StorageAnalysis:
+        """Sizes, counts and ages of the non-hidden files under ``directory``, in one pass.
         
-        for dirpath, _, filenames in os.walk(directory):
-            for filename in filenames:
-                if not self.file_utils.is_hidden_file(filename):
-                    category = self.file_utils.get_file_category(filename)
-                    file_path = os.path.join(dirpath, filename)
-                    try:
-                        usage_by_category[category] += os.path.getsize(file_path)
-                    except OSError:
-                        continue
+        Each file is stat'ed once; ``progress`` receives the number of files
+        seen so far after every directory.
+        """
+        categories = tuple(FileOrganizerConfig.EXTENSIONS_MAPPING)
+        index = {category: i for i, category in enumerate(categories)}
+        bytes_by_category = [0] * len(categories)
+        files_by_category = [0] * len(categories)
+        files_by_age = [0] * len(AGE_RANGES)
+        largest: List[Tuple[int, str]] = []  # min-heap of the ``top_files`` largest
+        now = time.time()
         
-        return {cat: self.file_utils.format_file_size(size) for cat, size in usage_by_category.items()}
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                                continue
+                            if self.file_utils.is_hidden_file(entry.name) or not entry.is_file():
+                                continue
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        i = index[self.file_utils.get_file_category(entry.name)]
+                        bytes_by_category[i] += st.st_size
+                        files_by_category[i] += 1
+                        age_days = (now - st.st_mtime) / 86400
+                        files_by_age[next(j for j, (_, days) in enumerate(AGE_RANGES) if age_days < days)] += 1
+                        if len(largest) < top_files:
+                            heapq.heappush(largest, (st.st_size, entry.path))
+                        elif largest and st.st_size > largest[0][0]:
+                            heapq.heapreplace(largest, (st.st_size, entry.path))
+            except OSError:
+                continue
+            if progress is not None:
+                progress(sum(files_by_category))
+        
+        return StorageAnalysis(
+            categories=categories,
+            bytes_by_category=tuple(bytes_by_category),
+            files_by_category=tuple(files_by_category),
+            age_ranges=tuple(label for label, _ in AGE_RANGES),
+            files_by_age=tuple(files_by_age),
+            largest_files=tuple((path, size) for size, path in sorted(largest, reverse=True)),
+            total_bytes=sum(bytes_by_category),
+            total_files=sum(files_by_category),
+        )
+    
+    def analyze_storage_usage(self, directory: str) -> Dict[str, int]:
+        """Analyze storage usage by category, in bytes."""
+        analysis = self.analyze(directory, top_files=0)
+        return dict(zip(analysis.categories, analysis.bytes_by_category))
     
     def get_file_distribution(self, directory: str) -> Dict[str, int]:
         """Get file type distribution statistics."""
@@ -75,28 +144,10 @@ class FileAnalyzer:
         
         return age_ranges
     
-    def generate_disk_space_report(self, directory: str) -> Dict[str, str]:
-        """Generate detailed disk space usage report."""
-        total_size = 0
-        largest_files = []
-        
-        for dirpath, _, filenames in os.walk(directory):
-            for filename in filenames:
-                if self.file_utils.is_hidden_file(filename):
-                    continue
-                    
-                file_path = os.path.join(dirpath, filename)
-                try:
-                    size = os.path.getsize(file_path)
-                    total_size += size
-                    largest_files.append((file_path, size))
-                except OSError:
-                    continue
-        
-        largest_files.sort(key=lambda x: x[1], reverse=True)
-        top_files = [(f, self.file_utils.format_file_size(s)) for f, s in largest_files[:10]]
-        
+    def generate_disk_space_report(self, directory: str) -> Dict:
+        """Generate detailed disk space usage report: total bytes and the ten largest files in bytes."""
+        analysis = self.analyze(directory)
         return {
-            'total_space': self.file_utils.format_file_size(total_size),
-            'largest_files': dict(top_files)
-        }
\ No newline at end of file
+            'total_space': analysis.total_bytes,
+            'largest_files': dict(analysis.largest_files)
+        }
@@ -1,8 +1,11 @@
 from app.config.FileOrganiserConfig import FileOrganizerConfig
+from app.core.CompactLogCodec import CompactLogCodec
 import json
 import os
+import threading
+from collections import Counter
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 
 import logging
 
@@ -10,48 +13,206 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# One lock per log file, shared by every FileLogger writing it in this process
+_log_locks: Dict[str, threading.RLock] = {}
+_log_locks_guard = threading.Lock()
+
+
+def _log_lock(log_file: str) -> threading.RLock:
+    with _log_locks_guard:
+        return _log_locks.setdefault(os.path.abspath(log_file), threading.RLock())
+
 
 class FileLogger:
     """Handles logging of file operations."""
     
-    def __init__(self, log_file: str = FileOrganizerConfig.LOG_FILE):
+    def __init__(self, log_file: Optional[str] = None, encoding: str = FileOrganizerConfig.LOG_ENCODING):
+        self.encoding = encoding
+        if log_file is None:
+            log_file = FileOrganizerConfig.COMPACT_LOG_FILE if encoding == "compact" else FileOrganizerConfig.LOG_FILE
         self.log_file = log_file
+        self._codec = CompactLogCodec()
+        self._codec_size: Optional[int] = None
+        self._lock = _log_lock(log_file)
         self.setup_logging()
     
     def setup_logging(self) -> None:
         """Initialize or load the log file."""
         try:
-            if not os.path.exists(self.log_file):
-                with open(self.log_file, 'w') as f:
-                    json.dump({"moves": [], "errors": []}, f)
+            with self._lock:
+                if not os.path.exists(self.log_file):
+                    self.save({"moves": [], "errors": []})
         except Exception as e:
             logger.error(f"Failed to setup logging: {e}")
     
-    def log_action(self, action_type: str, source: str, destination: Optional[str] = None, error_msg: Optional[str] = None) -> None:
-        """Log file movements and errors."""
+    def undo_journal_file(self, action_type: str = "moves") -> str:
+        """Path of the append-only journal written while an undo of ``action_type`` is running."""
+        return f"{self.log_file}.{action_type}.undo"
+    
+    def load(self) -> Dict[str, List[Dict]]:
+        """Read the operation log, returning an empty log if none exists."""
+        if not os.path.exists(self.log_file):
+            return {"moves": [], "errors": []}
+        with open(self.log_file, 'rb') as f:
+            blob = f.read()
+        
+        # Either encoding can be read back, whatever this logger writes
+        if CompactLogCodec.is_compact(blob):
+            data = self._codec.decode(blob)
+            self._codec_size = len(blob)
+            return data
+        
+        self._codec_size = None
+        return json.loads(blob)
+    
+    def save(self, data: Dict[str, List[Dict]]) -> None:
+        """Atomically replace the operation log with ``data``."""
+        tmp_path = f"{self.log_file}.tmp"
+        with open(tmp_path, 'wb') as f:
+            if self.encoding == "compact":
+                blob = self._codec.encode(data)
+            else:
+                blob = json.dumps(data, indent=4).encode()
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_file)
+        self._codec_size = len(blob) if self.encoding == "compact" else None
+    
+    def _append_compact(self, action_type: str, entry: Dict) -> None:
+        """Append one entry to a compact log without rewriting it."""
+        size = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else None
+        if size is None or size != self._codec_size:
+            # Another writer touched the file: reload the intern tables first
+            data = self.load()
+            if self._codec_size is None:
+                self.save(data)
+        
         try:
-            # Read existing data
-            data = {"moves": [], "errors": []}
-            if os.path.exists(self.log_file):
-                with open(self.log_file, 'r') as f:
-                    data = json.load(f)
-            
-            # Add new entry
-            entry = {
-                "timestamp": datetime.now().strftime(FileOrganizerConfig.DATE_FORMAT),
-                "source": source,
-                "destination": destination,
-                "error": error_msg
-            }
-            
-            if action_type not in data:
-                data[action_type] = []
+            record = self._codec.encode_entry(action_type, entry)
+            with open(self.log_file, 'r+b') as f:
+                f.seek(self._codec.valid_length)
+                if self._codec.valid_length < self._codec_size:
+                    # Only a record cut short at the end of the file decodes this way
+                    logger.warning(f"Dropping {self._codec_size - self._codec.valid_length} bytes of a torn "
+                                   f"record at the end of {self.log_file}")
+                    f.truncate()
+                f.write(record)
+        except Exception:
+            # The intern tables may now declare IDs that never reached the file; reload them next time
+            self._codec.reset()
+            self._codec_size = None
+            raise
+        self._codec.valid_length += len(record)
+        self._codec_size = self._codec.valid_length
+    
+    def open_undo_journal(self, action_type: str = "moves"):
+        """Open the undo journal for appending one JSON line per reverted entry."""
+        return open(self.undo_journal_file(action_type), 'a')
+    
+    @staticmethod
+    def journal_entry(journal, entry: Dict) -> None:
+        """Durably record that ``entry`` has been reverted."""
+        journal.write(json.dumps({"source": entry["source"], "destination": entry["destination"]}) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+    
+    @staticmethod
+    def _entry_key(entry: Dict) -> tuple:
+        return entry.get("timestamp"), entry["source"], entry.get("destination")
+    
+    def commit_undo(self, data: Dict[str, List[Dict]], remaining: Iterable[Dict], action_type: str = "moves") -> None:
+        """Persist the entries left after an undo and discard the journal.
+        
+        ``data`` is the log as the undo loaded it.  The log is re-read under
+        the write lock and only the undone entries are dropped from
+        ``action_type``, so entries logged meanwhile are kept; ``data`` is
+        updated to the log as saved.
+        """
+        undone = Counter(self._entry_key(e) for e in data.get(action_type, []))
+        undone.subtract(self._entry_key(e) for e in remaining)
+        with self._lock:
+            current = self.load()
+            kept = []
+            for entry in current.get(action_type, []):
+                key = self._entry_key(entry)
+                if undone[key] > 0:
+                    undone[key] -= 1
+                    continue
+                kept.append(entry)
+            current[action_type] = kept
+            self.save(current)
+            if os.path.exists(self.undo_journal_file(action_type)):
+                os.remove(self.undo_journal_file(action_type))
+        data.clear()
+        data.update(current)
+    
+    def recover_undo_journal(self, data: Dict[str, List[Dict]], action_type: str = "moves") -> int:
+        """Drop entries already reverted by an interrupted undo; returns how many."""
+        with self._lock:
+            if not os.path.exists(self.undo_journal_file(action_type)):
+                return 0
             
-            data[action_type].append(entry)
+            reverted = set()
+            with open(self.undo_journal_file(action_type), 'r') as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line means that revert was never confirmed.
+                        break
+                    reverted.add((item["source"], item["destination"]))
             
-            # Write updated data
-            with open(self.log_file, 'w') as f:
-                json.dump(data, f, indent=4)
+            entries = data.get(action_type, [])
+            remaining = [e for e in entries if (e["source"], e["destination"]) not in reverted]
+            recovered = len(entries) - len(remaining)
+            self.commit_undo(data, remaining, action_type)
+        logger.info(f"Recovered {recovered} entries from interrupted undo")
+        return recovered
+    
+    @staticmethod
+    def make_entry(source: str, destination: Optional[str] = None, error_msg: Optional[str] = None,
+                   extra: Optional[Dict] = None) -> Dict:
+        """Build a log entry; ``extra`` holds action-specific fields needed for undo."""
+        entry = {
+            "timestamp": datetime.now().strftime(FileOrganizerConfig.DATE_FORMAT),
+            "source": source,
+            "destination": destination,
+            "error": error_msg
+        }
+        if extra:
+            entry.update(extra)
+        return entry
+    
+    def log_action(self, action_type: str, source: str, destination: Optional[str] = None,
+                   error_msg: Optional[str] = None, extra: Optional[Dict] = None) -> None:
+        """Log file movements and errors."""
+        self.log_batch(action_type, [self.make_entry(source, destination, error_msg, extra)])
+    
+    def log_batch(self, action_type: str, entries: List[Dict]) -> bool:
+        """Log several entries of one action type with a single write; returns False if it failed.
+        
+        Callers that destroy data the entries describe must check the result
+        before doing so.
+        """
+        if not entries:
+            return True
+        try:
+            with self._lock:
+                if self.encoding == "compact":
+                    for entry in entries:
+                        self._append_compact(action_type, entry)
+                    return True
+                
+                # Read existing data
+                data = self.load()
+                
+                if action_type not in data:
+                    data[action_type] = []
                 
+                data[action_type].extend(entries)
+                self.save(data)
+            return True
         except Exception as e:
             logger.error(f"Failed to log action: {e}")
+            return False
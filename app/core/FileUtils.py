@@ -1,26 +1,61 @@
+import mmap
 import os
+import random
+import threading
 
 from pathlib import Path
 import hashlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from app.config.FileOrganiserConfig import FileOrganizerConfig
 
+try:
+    import xxhash
+except ImportError:  # optional, enables the xxh3 backends
+    xxhash = None
+
+_buffers = threading.local()
+
+# Gear table for content-defined chunking; seeded so boundaries are stable across runs
+_gear_random = random.Random(0x46434443)
+_GEAR = tuple(_gear_random.getrandbits(64) for _ in range(256))
+_MASK64 = (1 << 64) - 1
+
+
+# Digests decide equality on their own once sizes match, so every backend is at least 64 bits wide
+HASH_ALGORITHMS: Dict[str, Callable] = {
+    "sha256": hashlib.sha256,
+    "blake2b": hashlib.blake2b,
+}
+if xxhash is not None:
+    HASH_ALGORITHMS["xxh3_64"] = xxhash.xxh3_64
+    HASH_ALGORITHMS["xxh3_128"] = xxhash.xxh3_128
+
+
 class FileUtils:
     """Utility functions for file operations."""
+    
     @staticmethod
-    def is_hidden_file(filename: str)->bool:
-        return filename.startswith(".")
+    def available_hash_algorithms() -> List[str]:
+        """Names accepted by ``get_hasher`` on this installation."""
+        return list(HASH_ALGORITHMS)
     
     @staticmethod
-    def get_file_hash(path:str,chunk_size=8193)->str:
+    def resolve_hash_algorithm(algorithm: str) -> str:
+        """``algorithm``, or blake2b for an xxh3 backend when ``xxhash`` is not installed."""
+        if algorithm not in HASH_ALGORITHMS and algorithm.startswith("xxh3_"):
+            return "blake2b"
+        return algorithm
+    
+    @staticmethod
+    def get_hasher(algorithm: str = "sha256"):
+        """Return a new hashlib-style object for ``algorithm``."""
         try:
-            sha256=hashlib.sha256()
-            with open(path,"rb") as f:
-                for chunk in iter(lambda: f,read(chunk_size),b""):
-                    sha256.update(chunk)
-            return sha256.hexdigest()
-        except Exception as e:
-            return f"ERROR: {e}"
-
+            return HASH_ALGORITHMS[algorithm]()
+        except KeyError:
+            raise ValueError(
+                f"Unsupported hash algorithm '{algorithm}'; available: {', '.join(HASH_ALGORITHMS)}"
+            ) from None
+    
     @staticmethod
     def get_unique_filename(destination_path: str) -> str:
         """Handle duplicate filenames by adding suffixes."""
@@ -54,17 +89,195 @@ class FileUtils:
         return filename.startswith('.') or Path(filename).stem.startswith('.')
     
     @staticmethod
-    def get_file_hash(file_path: str) -> str:
-        """Calculate SHA-256 hash of a file."""
-        sha256 = hashlib.sha256()
+    def tree_fingerprint(directory: str) -> str:
+        """Digest of the mtime of every directory under ``directory``.
+        
+        Only directories are stat'ed, so this is much cheaper than a scan, and
+        it changes whenever a file is added, removed or renamed anywhere in the
+        tree.  Edits that rewrite a file in place are not reflected.
+        """
+        hasher = hashlib.sha1()
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                hasher.update(f"{current}\0{os.stat(current).st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                hasher.update(f"{current}\0missing\n".encode("utf-8", "surrogateescape"))
+        return hasher.hexdigest()
+    
+    @staticmethod
+    def _read_buffer() -> memoryview:
+        """Per-thread reusable read buffer, so hashing allocates nothing per block."""
+        view = getattr(_buffers, "view", None)
+        if view is None:
+            view = memoryview(bytearray(FileOrganizerConfig.HASH_BUFFER_SIZE))
+            _buffers.view = view
+        return view
+    
+    @staticmethod
+    def hash_file(file_path: str, algorithm: str = "sha256",
+                  ranges: Optional[Iterable[Tuple[int, Optional[int]]]] = None) -> str:
+        """Hash a whole file, or only the given (offset, length) ranges, and return the hex digest.
+        
+        Large whole-file hashes go through a read-only ``mmap``; everything else
+        is read with ``readinto`` into a reused buffer.  The kernel is told the
+        access is sequential where ``posix_fadvise`` exists.  Raises OSError.
+        """
+        hasher = FileUtils.get_hasher(algorithm)
+        with open(file_path, 'rb', buffering=0) as f:
+            fd = f.fileno()
+            size = os.fstat(fd).st_size
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            
+            if ranges is None and size >= FileOrganizerConfig.MMAP_HASH_THRESHOLD:
+                with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    view = memoryview(mm)
+                    try:
+                        step = FileOrganizerConfig.MMAP_HASH_STEP
+                        for offset in range(0, size, step):
+                            hasher.update(view[offset:offset + step])
+                    finally:
+                        view.release()
+                return hasher.hexdigest()
+            
+            buffer = FileUtils._read_buffer()
+            for offset, length in (ranges if ranges is not None else [(0, None)]):
+                f.seek(offset)
+                remaining = length
+                while remaining is None or remaining > 0:
+                    target = buffer if remaining is None or remaining >= len(buffer) else buffer[:remaining]
+                    n = f.readinto(target)
+                    if not n:
+                        break
+                    hasher.update(buffer[:n])
+                    if remaining is not None:
+                        remaining -= n
+        return hasher.hexdigest()
+    
+    @staticmethod
+    def files_identical(first_path: str, second_path: str) -> bool:
+        """Compare two files byte for byte using reused buffers. Raises OSError."""
+        if os.path.getsize(first_path) != os.path.getsize(second_path):
+            return False
+        first_buffer = FileUtils._read_buffer()
+        second_buffer = memoryview(bytearray(len(first_buffer)))
+        with open(first_path, 'rb', buffering=0) as first, open(second_path, 'rb', buffering=0) as second:
+            while True:
+                n = first.readinto(first_buffer)
+                if not n:
+                    return not second.readinto(second_buffer[:1])
+                m = 0
+                while m < n:
+                    read = second.readinto(second_buffer[m:n])
+                    if not read:
+                        return False
+                    m += read
+                if first_buffer[:n] != second_buffer[:n]:
+                    return False
+    
+    @staticmethod
+    def get_file_hash(file_path: str, algorithm: str = "sha256") -> str:
+        """Calculate the hash of a file (SHA-256 by default)."""
+        try:
+            return FileUtils.hash_file(file_path, algorithm)
+        except Exception as e:
+            return f"ERROR: {e}"
+    
+    @staticmethod
+    def get_partial_hash(file_path: str, file_size: int, edge_size: int = FileOrganizerConfig.PARTIAL_HASH_SIZE,
+                         algorithm: str = "sha256") -> str:
+        """Calculate a hash over the first and last ``edge_size`` bytes of a file.
+        
+        Files no larger than ``2 * edge_size`` are hashed in full, so the result
+        equals ``get_file_hash`` for them.
+        """
         try:
-            with open(file_path, 'rb') as f:
-                for block in iter(lambda: f.read(FileOrganizerConfig.HASH_BLOCK_SIZE), b''):
-                    sha256.update(block)
-            return sha256.hexdigest()
+            if file_size <= 2 * edge_size:
+                return FileUtils.hash_file(file_path, algorithm, ranges=[(0, None)])
+            return FileUtils.hash_file(file_path, algorithm, ranges=[(0, edge_size), (file_size - edge_size, edge_size)])
         except Exception as e:
             return f"ERROR: {e}"
     
+    @staticmethod
+    def _chunk_cut(data: bytes, start: int, end: int, min_size: int, avg_size: int,
+                   mask_small: int, mask_large: int) -> int:
+        """Return the end of the chunk starting at ``start`` (FastCDC with normalized chunking)."""
+        if end - start <= min_size:
+            return end
+        gear = _GEAR
+        mask64 = _MASK64
+        h = 0
+        normal = min(start + avg_size, end)
+        # A stricter mask before the average size and a looser one after it
+        # keep chunk sizes tightly around the average
+        for i, byte in enumerate(data[start + min_size:normal], start + min_size):
+            h = (h + h + gear[byte]) & mask64
+            if not h & mask_small:
+                return i + 1
+        for i, byte in enumerate(data[normal:end], normal):
+            h = (h + h + gear[byte]) & mask64
+            if not h & mask_large:
+                return i + 1
+        return end
+    
+    @staticmethod
+    def get_chunk_hashes(file_path: str, algorithm: str = "sha256",
+                         min_size: int = FileOrganizerConfig.CDC_MIN_CHUNK,
+                         avg_size: int = FileOrganizerConfig.CDC_AVG_CHUNK,
+                         max_size: int = FileOrganizerConfig.CDC_MAX_CHUNK,
+                         max_bytes: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Split a file into content-defined chunks and return (digest, length) for each.
+        
+        Boundaries come from a rolling gear hash, so an insertion only moves
+        the chunks around it and the rest still match.  With ``max_bytes``
+        only the chunks covering the first ``max_bytes`` of the file are
+        returned.  Raises OSError.
+        """
+        bits = avg_size.bit_length() - 1
+        mask_small = ((1 << (bits + 1)) - 1) << (63 - bits)
+        mask_large = ((1 << (bits - 1)) - 1) << (65 - bits)
+        chunks: List[Tuple[str, int]] = []
+        
+        with open(file_path, 'rb') as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            # The buffer is compacted in place before each read, so only the
+            # unchunked tail (under max_size) is moved rather than copied with the block
+            data = bytearray()
+            pos = 0
+            chunked = 0
+            eof = False
+            while True:
+                if not eof and len(data) - pos < max_size:
+                    del data[:pos]
+                    pos = 0
+                    block = f.read(FileOrganizerConfig.CDC_READ_SIZE)
+                    if block:
+                        data += block
+                        continue
+                    eof = True
+                if pos >= len(data) or (max_bytes is not None and chunked >= max_bytes):
+                    return chunks
+                cut = FileUtils._chunk_cut(data, pos, min(pos + max_size, len(data)),
+                                           min_size, avg_size, mask_small, mask_large)
+                hasher = FileUtils.get_hasher(algorithm)
+                with memoryview(data) as view:
+                    hasher.update(view[pos:cut])
+                chunks.append((hasher.hexdigest(), cut - pos))
+                chunked += cut - pos
+                pos = cut
+    
     @staticmethod
     def format_file_size(size_bytes: int) -> str:
         """Format file size in human readable format."""
@@ -0,0 +1,150 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class HashCache:
+    """Persistent content-hash cache keyed by (st_dev, st_ino, st_size, st_mtime_ns).
+    
+    Digests are stored per hash kind ("full", "partial") and algorithm, so
+    switching the dedup backend never returns a digest from another one.
+    A cached digest is only returned while the file's size and mtime still
+    match.  Hits and new digests are buffered in memory and written in
+    batches; the least recently used rows are evicted once the cache grows
+    past ``max_entries``.
+    """
+    
+    _shared: Dict[str, "HashCache"] = {}
+    _shared_lock = threading.Lock()
+    
+    def __init__(self, path: str = FileOrganizerConfig.HASH_CACHE_FILE,
+                 max_entries: int = FileOrganizerConfig.HASH_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pending: List[Tuple] = []
+        self._touched: Dict[Tuple[int, int, str, str], int] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        try:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(hashes)")]
+            if columns and "algorithm" not in columns:
+                # Cache from before algorithms were recorded; it is only a cache
+                self._conn.execute("DROP TABLE hashes")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS hashes (
+                    dev INTEGER NOT NULL,
+                    ino INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    algorithm TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    last_used INTEGER NOT NULL,
+                    PRIMARY KEY (dev, ino, kind, algorithm)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS hashes_last_used ON hashes (last_used)")
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Hash cache disabled, cannot open {path}: {e}")
+            self._conn = None
+    
+    @classmethod
+    def shared(cls, path: str = FileOrganizerConfig.HASH_CACHE_FILE) -> "HashCache":
+        """Return the process-wide cache for ``path``."""
+        with cls._shared_lock:
+            if path not in cls._shared:
+                cls._shared[path] = cls(path)
+                atexit.register(cls._shared[path].flush)
+            return cls._shared[path]
+    
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+    
+    def get(self, st: os.stat_result, kind: str = "full", algorithm: str = "sha256") -> Optional[str]:
+        """Return the cached digest for a file, or None if missing or stale."""
+        if self._conn is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, digest FROM hashes WHERE dev = ? AND ino = ? AND kind = ? AND algorithm = ?",
+                (st.st_dev, st.st_ino, kind, algorithm)
+            ).fetchone()
+            if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns:
+                return None
+            self._touched[(st.st_dev, st.st_ino, kind, algorithm)] = int(time.time())
+            return row[2]
+    
+    def put(self, st: os.stat_result, digest: str, kind: str = "full", algorithm: str = "sha256") -> None:
+        """Record the digest of a file as of ``st``."""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._pending.append(
+                (st.st_dev, st.st_ino, kind, algorithm, st.st_size, st.st_mtime_ns, digest, int(time.time()))
+            )
+            if len(self._pending) >= FileOrganizerConfig.HASH_CACHE_BATCH_SIZE:
+                self._flush_locked()
+    
+    def get_or_compute(self, path: str, st: os.stat_result, compute: Callable[[str], str],
+                       kind: str = "full", algorithm: str = "sha256") -> str:
+        """Return the cached digest or compute and cache it; errors are not cached."""
+        digest = self.get(st, kind, algorithm)
+        if digest is None:
+            digest = compute(path)
+            if not digest.startswith("ERROR"):
+                self.put(st, digest, kind, algorithm)
+        return digest
+    
+    def flush(self) -> None:
+        """Write buffered entries and LRU timestamps, then enforce the size bound."""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._flush_locked(evict=True)
+    
+    def _flush_locked(self, evict: bool = False) -> None:
+        try:
+            with self._conn:
+                if self._pending:
+                    self._conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._pending)
+                if self._touched:
+                    self._conn.executemany(
+                        "UPDATE hashes SET last_used = ? WHERE dev = ? AND ino = ? AND kind = ? AND algorithm = ?",
+                        [(used, *key) for key, used in self._touched.items()]
+                    )
+                if not evict:
+                    return
+                count = self._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM hashes WHERE (dev, ino, kind, algorithm) IN "
+                        "(SELECT dev, ino, kind, algorithm FROM hashes ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to flush hash cache: {e}")
+        finally:
+            self._pending.clear()
+            self._touched.clear()
+    
+    def close(self) -> None:
+        """Flush and close the underlying database."""
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
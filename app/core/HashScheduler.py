@@ -0,0 +1,197 @@
+import multiprocessing
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+from app.core.FileUtils import FileUtils
+from app.core.IOScheduler import IOScheduler
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class HashJob(NamedTuple):
+    """One file to hash; kind is "full" or "partial"."""
+    path: str
+    size: int
+    kind: str = "full"
+    algorithm: str = "sha256"
+    edge_size: int = FileOrganizerConfig.PARTIAL_HASH_SIZE
+    dev: int = -1
+    
+    @property
+    def bytes_to_read(self) -> int:
+        return self.size if self.kind == "full" else min(self.size, 2 * self.edge_size)
+
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process pool that never forks the (multi-threaded) parent directly."""
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver") if "forkserver" in methods else None
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+def run_hash_job(job: HashJob) -> str:
+    """Hash one job; module level so process pools can pickle it."""
+    if job.kind == "partial":
+        return FileUtils.get_partial_hash(job.path, job.size, job.edge_size, job.algorithm)
+    return FileUtils.get_file_hash(job.path, job.algorithm)
+
+
+class HashScheduler:
+    """Streams hash jobs through a bounded, self-tuning worker pool.
+    
+    Jobs are pulled from the input iterator only as slots free up, so the
+    number of queued paths never exceeds the current concurrency.  Work starts
+    on threads; after a warm-up the scheduler moves to a process pool when the
+    observed load is CPU-bound (per-worker throughput near single-core hash
+    speed, i.e. cache-hot data) or dominated by tiny files.  The concurrency
+    limit is then hill-climbed on the MB/s measured in each interval.
+    With an ``IOScheduler`` the per-device read limits are honoured too, and
+    jobs for a saturated device wait in input order.
+    """
+    
+    _cpu_mbps: Dict[str, float] = {}
+    
+    def __init__(self, mode: str = "auto",
+                 min_workers: int = FileOrganizerConfig.HASH_MIN_WORKERS,
+                 max_workers: Optional[int] = None):
+        if mode not in ("auto", "thread", "process"):
+            raise ValueError(f"Unknown scheduler mode '{mode}'")
+        self.mode = mode
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max_workers or FileOrganizerConfig.HASH_MAX_WORKERS
+        self.stats: Dict[str, object] = {}
+    
+    @classmethod
+    def cpu_mbps(cls, algorithm: str) -> float:
+        """Single-core in-memory hash speed for ``algorithm``, measured once per process."""
+        if algorithm not in cls._cpu_mbps:
+            data = bytes(4 * 1024 * 1024)
+            hasher = FileUtils.get_hasher(algorithm)
+            start = time.perf_counter()
+            for _ in range(4):
+                hasher.update(data)
+            elapsed = time.perf_counter() - start
+            cls._cpu_mbps[algorithm] = 16 / elapsed if elapsed > 0 else float("inf")
+        return cls._cpu_mbps[algorithm]
+    
+    def _cpu_bound(self, mbps: float, workers: int, jobs: int, bytes_done: int, algorithm: str) -> bool:
+        """Decide from the warm-up window whether hashing is CPU-bound."""
+        if (os.cpu_count() or 1) < 2 or jobs == 0:
+            return False
+        if bytes_done / jobs < FileOrganizerConfig.HASH_SMALL_FILE_BYTES:
+            return True
+        return mbps / max(1, workers) >= 0.5 * self.cpu_mbps(algorithm)
+    
+    def run(self, jobs: Iterable[HashJob], io_scheduler: Optional[IOScheduler] = None) -> Iterator[Tuple[HashJob, str]]:
+        """Yield (job, digest) pairs as they complete, in no particular order."""
+        jobs = iter(jobs)
+        deferred: deque = deque()
+        device_load: Counter = Counter()
+        input_done = False
+        
+        def next_job() -> Optional[HashJob]:
+            """Next job whose device has a free slot; jobs for busy devices wait in order."""
+            nonlocal input_done
+            if io_scheduler is None:
+                return next(jobs, None)
+            for index, job in enumerate(deferred):
+                if device_load[job.dev] < io_scheduler.device_limit(job.dev):
+                    del deferred[index]
+                    return job
+            while not input_done and len(deferred) < FileOrganizerConfig.HASH_MAX_DEFERRED:
+                job = next(jobs, None)
+                if job is None:
+                    input_done = True
+                    break
+                if device_load[job.dev] < io_scheduler.device_limit(job.dev):
+                    return job
+                deferred.append(job)
+            return None
+        
+        cpu_count = os.cpu_count() or 1
+        threads = ThreadPoolExecutor(max_workers=self.max_workers)
+        processes: Optional[ProcessPoolExecutor] = None
+        executor: Executor = threads
+        mode = "process" if self.mode == "process" else "thread"
+        if mode == "process":
+            processes = process_pool(cpu_count)
+            executor = processes
+        
+        limit = self.min_workers if mode == "thread" else cpu_count
+        in_flight: Dict[Future, HashJob] = {}
+        exhausted = False
+        step = 1
+        
+        started = window_start = time.perf_counter()
+        window_bytes = total_bytes = completed = 0
+        last_mbps = 0.0
+        warmed_up = self.mode != "auto"
+        
+        try:
+            while True:
+                while not exhausted and len(in_flight) < limit:
+                    job = next_job()
+                    if job is None:
+                        # Deferred jobs are still pending while their device is busy
+                        exhausted = io_scheduler is None or (input_done and not deferred)
+                        break
+                    device_load[job.dev] += 1
+                    in_flight[executor.submit(run_hash_job, job)] = job
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = in_flight.pop(future)
+                    device_load[job.dev] -= 1
+                    try:
+                        digest = future.result()
+                    except Exception as e:
+                        digest = f"ERROR: {e}"
+                    if not digest.startswith("ERROR"):
+                        window_bytes += job.bytes_to_read
+                        total_bytes += job.bytes_to_read
+                    completed += 1
+                    yield job, digest
+                
+                now = time.perf_counter()
+                elapsed = now - window_start
+                if elapsed < FileOrganizerConfig.HASH_ADAPT_INTERVAL:
+                    continue
+                mbps = window_bytes / (1024 * 1024) / elapsed
+                
+                if not warmed_up and completed >= FileOrganizerConfig.HASH_WARMUP_JOBS:
+                    warmed_up = True
+                    if self._cpu_bound(mbps, limit, completed, total_bytes, job.algorithm):
+                        logger.info(f"Hashing is CPU-bound at {mbps:.1f} MB/s; switching to {cpu_count} processes")
+                        processes = process_pool(cpu_count)
+                        executor = processes
+                        mode = "process"
+                        limit = cpu_count
+                elif mode == "thread":
+                    # Hill-climb the concurrency on observed throughput; hold on a plateau
+                    if mbps < last_mbps * 0.95:
+                        step = -step
+                    if mbps < last_mbps * 0.95 or mbps > last_mbps * 1.05:
+                        limit = min(self.max_workers, max(self.min_workers, limit + step))
+                
+                last_mbps = mbps
+                window_start, window_bytes = now, 0
+        finally:
+            threads.shutdown(wait=True, cancel_futures=True)
+            if processes is not None:
+                processes.shutdown(wait=True, cancel_futures=True)
+            elapsed = time.perf_counter() - started
+            self.stats = {
+                "mode": mode,
+                "workers": limit,
+                "jobs": completed,
+                "mbps": total_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0,
+            }
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import sqlite3
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+from app.core.FileLogger import FileLogger
+from app.core.FileUtils import FileUtils
+from app.core.HashScheduler import HashJob, HashScheduler
+from app.core.IOScheduler import IOScheduler
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class IntegrityManifest:
+    """Per-file digests and per-directory Merkle roots for one tree, stored in SQLite.
+    
+    Paths are kept relative to the tree root, so manifests of a tree and of
+    its copy compare directly.  A directory's root hash covers the names and
+    digests of its files and the names and roots of its subdirectories, so
+    two manifests agree on a directory exactly when everything below it
+    agrees, and ``diff`` only descends into directories whose roots differ.
+    ``update`` re-reads only files whose (inode, size, mtime) changed since
+    the stored baseline, unless asked for a full re-hash.
+    """
+    
+    def __init__(self, path: str, algorithm: str = FileOrganizerConfig.INTEGRITY_HASH_ALGORITHM,
+                 file_logger: Optional[FileLogger] = None, scheduler: Optional[HashScheduler] = None,
+                 io_scheduler: Optional[IOScheduler] = None):
+        self.path = path
+        self.algorithm = algorithm
+        FileUtils.get_hasher(algorithm)  # fail fast on an unknown backend
+        self.logger = file_logger or FileLogger()
+        self.scheduler = scheduler or HashScheduler()
+        self.io_scheduler = io_scheduler or IOScheduler()
+        self.stats: Dict[str, int] = {}
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, dir TEXT NOT NULL, name TEXT NOT NULL,
+                ino INTEGER, size INTEGER, mtime_ns INTEGER, digest TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY, parent TEXT, name TEXT NOT NULL, hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+        """)
+    
+    @staticmethod
+    def default_path(root: str) -> str:
+        """Manifest location for ``root`` under ``INTEGRITY_MANIFEST_DIR``."""
+        key = hashlib.sha256(os.path.abspath(root).encode()).hexdigest()[:16]
+        return os.path.join(FileOrganizerConfig.INTEGRITY_MANIFEST_DIR, f"{key}.sqlite3")
+    
+    @staticmethod
+    def _join(directory: str, name: str) -> str:
+        return f"{directory}/{name}" if directory else name
+    
+    def _scan(self, root: str) -> Tuple[List[str], List[Tuple[str, os.stat_result]]]:
+        """Every directory (relative, "" for the root) and every regular file below ``root``."""
+        directories, files = [], []
+        stack = [""]
+        while stack:
+            relative = stack.pop()
+            directories.append(relative)
+            try:
+                with os.scandir(os.path.join(root, relative) if relative else root) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(self._join(relative, entry.name))
+                            elif entry.is_file(follow_symlinks=False):
+                                files.append((self._join(relative, entry.name), entry.stat(follow_symlinks=False)))
+                        except OSError as e:
+                            self.logger.log_action("errors", entry.path, error_msg=f"Manifest scan failed: {e}")
+            except OSError as e:
+                self.logger.log_action("errors", os.path.join(root, relative), error_msg=f"Manifest scan failed: {e}")
+        return directories, files
+    
+    def _merkle(self, directories: List[str], digests: Dict[str, str]) -> Dict[str, str]:
+        """Root hash of every directory, computed bottom-up."""
+        files_in: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        for path, digest in digests.items():
+            directory, _, name = path.rpartition("/")
+            files_in[directory].append((name, digest))
+        subdirs_in: Dict[str, List[str]] = defaultdict(list)
+        for directory in directories:
+            if directory:
+                subdirs_in[directory.rpartition("/")[0]].append(directory)
+        
+        roots: Dict[str, str] = {}
+        for directory in sorted(directories, key=lambda d: d.count("/") + bool(d), reverse=True):
+            hasher = hashlib.sha256()
+            for name, digest in sorted(files_in[directory]):
+                hasher.update(b"f\0" + name.encode("utf-8", "surrogateescape") + b"\0" + digest.encode() + b"\n")
+            for child in sorted(subdirs_in[directory]):
+                name = child.rpartition("/")[2]
+                hasher.update(b"d\0" + name.encode("utf-8", "surrogateescape") + b"\0" + roots[child].encode() + b"\n")
+            roots[directory] = hasher.hexdigest()
+        return roots
+    
+    def update(self, root: str, full: bool = False) -> Dict[str, int]:
+        """Bring the manifest up to date with ``root`` and return what was done.
+        
+        Unchanged files keep their stored digest; new and changed files (or
+        all files with ``full``) are hashed in on-disk order.
+        """
+        self.stats = defaultdict(int)
+        previous = {path: (ino, size, mtime_ns, digest) for path, ino, size, mtime_ns, digest in
+                    self._conn.execute("SELECT path, ino, size, mtime_ns, digest FROM files")}
+        directories, files = self._scan(root)
+        
+        digests: Dict[str, str] = {}
+        stats: Dict[str, os.stat_result] = {}
+        changed = []
+        for path, st in files:
+            stats[path] = st
+            old = previous.get(path)
+            if not full and old is not None and old[:3] == (st.st_ino, st.st_size, st.st_mtime_ns):
+                digests[path] = old[3]
+                self.stats["unchanged"] += 1
+            else:
+                changed.append(path)
+        
+        ordered = self.io_scheduler.order(changed, lambda p: os.path.join(root, p), stats.__getitem__)
+        jobs = (HashJob(os.path.join(root, p), stats[p].st_size, "full", self.algorithm, dev=stats[p].st_dev)
+                for p in ordered)
+        relative = {os.path.join(root, p): p for p in ordered}
+        for job, digest in self.scheduler.run(jobs, self.io_scheduler):
+            if digest.startswith("ERROR"):
+                self.logger.log_action("errors", job.path, error_msg=f"Manifest hashing failed: {digest}")
+                self.stats["errors"] += 1
+                continue
+            digests[relative[job.path]] = digest
+            self.stats["hashed"] += 1
+            self.stats["bytes_read"] += job.size
+        
+        roots = self._merkle(directories, digests)
+        with self._conn:
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM dirs")
+            self._conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", (
+                (path, path.rpartition("/")[0], path.rpartition("/")[2],
+                 stats[path].st_ino, stats[path].st_size, stats[path].st_mtime_ns, digest)
+                for path, digest in digests.items()
+            ))
+            self._conn.executemany("INSERT INTO dirs VALUES (?, ?, ?, ?)", (
+                (directory, directory.rpartition("/")[0] if directory else None, directory.rpartition("/")[2], digest)
+                for directory, digest in roots.items()
+            ))
+            self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                   [("root", os.path.abspath(root)), ("algorithm", self.algorithm)])
+        
+        logger.info(f"Manifest of {root}: {self.stats['hashed']} files hashed, "
+                    f"{self.stats['unchanged']} unchanged, root {roots.get('', '')[:16]}")
+        return dict(self.stats)
+    
+    def root_hash(self, directory: str = "") -> Optional[str]:
+        """Merkle root of ``directory`` (relative; "" for the tree root), or None if unknown."""
+        row = self._conn.execute("SELECT hash FROM dirs WHERE path = ?", (directory,)).fetchone()
+        return row[0] if row else None
+    
+    def _files_in(self, directory: str) -> Dict[str, str]:
+        return dict(self._conn.execute("SELECT path, digest FROM files WHERE dir = ?", (directory,)))
+    
+    def _subdirs_in(self, directory: str) -> Dict[str, str]:
+        return dict(self._conn.execute("SELECT path, hash FROM dirs WHERE parent = ?", (directory,)))
+    
+    def _files_below(self, directory: str) -> Iterator[str]:
+        # Every path under "dir/" sorts between "dir/" and "dir0" ('0' follows '/')
+        for (path,) in self._conn.execute("SELECT path FROM files WHERE path >= ? AND path < ?",
+                                          (directory + "/", directory + "0")):
+            yield path
+    
+    def diff(self, other: "IntegrityManifest") -> Dict[str, List[str]]:
+        """Files added, removed or modified in ``other`` relative to this manifest.
+        
+        Only directories whose Merkle roots differ are visited.
+        """
+        result: Dict[str, List[str]] = {"added": [], "removed": [], "modified": []}
+        stack = [""]
+        while stack:
+            directory = stack.pop()
+            if self.root_hash(directory) == other.root_hash(directory):
+                continue
+            mine, theirs = self._files_in(directory), other._files_in(directory)
+            result["added"].extend(path for path in theirs if path not in mine)
+            result["removed"].extend(path for path in mine if path not in theirs)
+            result["modified"].extend(path for path in mine if path in theirs and mine[path] != theirs[path])
+            
+            mine, theirs = self._subdirs_in(directory), other._subdirs_in(directory)
+            for path in theirs.keys() - mine.keys():
+                result["added"].extend(other._files_below(path))
+            for path in mine.keys() - theirs.keys():
+                result["removed"].extend(self._files_below(path))
+            stack.extend(path for path in mine.keys() & theirs.keys() if mine[path] != theirs[path])
+        for paths in result.values():
+            paths.sort()
+        return result
+    
+    def verify(self, root: str, full: bool = False) -> Dict[str, List[str]]:
+        """Compare ``root`` as it is now against this manifest without changing the baseline."""
+        current = IntegrityManifest(":memory:", self.algorithm, self.logger, self.scheduler, self.io_scheduler)
+        if not full:
+            # Seed with the baseline so unchanged files are not read again
+            current._conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                      self._conn.execute("SELECT * FROM files"))
+        current.update(root, full)
+        self.stats = current.stats
+        result = self.diff(current)
+        current.close()
+        return result
+    
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,182 @@
+import itertools
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been asked to stop."""
+
+
+@dataclass
+class Job:
+    """One background operation: its status, progress and, once finished, its result or error.
+    
+    The job function receives the ``Job`` itself and reports through
+    ``update``; cancellation is cooperative: ``update`` and ``check`` raise
+    ``JobCancelled`` once ``cancel`` has been called.  ``result`` may also be
+    filled in progressively so partial results are visible while running.
+    """
+    id: str
+    name: str
+    key: tuple = ()
+    status: str = "queued"  # queued, running, done, failed, cancelled
+    done: int = 0
+    total: int = 0
+    message: str = ""
+    result: Any = None
+    error: str = ""
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+    
+    @property
+    def fraction(self) -> float:
+        return min(1.0, self.done / self.total) if self.total else 0.0
+    
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+    
+    def check(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+    
+    def report(self, done: int, total: Optional[int] = None, message: Optional[str] = None) -> None:
+        """Record progress without checking for cancellation, for callbacks that must not raise."""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+    
+    def update(self, done: int, total: Optional[int] = None, message: Optional[str] = None) -> None:
+        """Report progress; raises ``JobCancelled`` if the job should stop."""
+        self.report(done, total, message)
+        self.check()
+    
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+
+class JobRunner:
+    """Runs jobs on a thread pool and keeps a bounded history of them by ID.
+    
+    Long-lived by design: a UI keeps one runner per process and polls it, so
+    jobs outlive the request (or Streamlit rerun) that started them.  CPU-bound
+    work inside a job still goes to the process pools the core modules use.
+    """
+    
+    def __init__(self, max_workers: int = FileOrganizerConfig.JOB_MAX_WORKERS,
+                 history: int = FileOrganizerConfig.JOB_HISTORY):
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+    
+    def submit(self, name: str, func: Callable[..., Any], *args, key: tuple = (), **kwargs) -> Job:
+        """Start ``func(job, *args, **kwargs)`` in the background.
+        
+        If a job with the same name and key is still active it is returned
+        instead of starting a second one.
+        """
+        with self._lock:
+            existing = self._latest(name, key)
+            if existing is not None and existing.active:
+                return existing
+            job = Job(id=f"{name}-{next(self._ids)}", name=name, key=key)
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+    
+    def _run(self, job: Job, func: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        job.started = time.time()
+        try:
+            job.check()
+            job.status = "running"
+            job.result = func(job, *args, **kwargs)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            logger.error(f"Job {job.id} failed: {e}\n{traceback.format_exc()}")
+        finally:
+            job.finished = time.time()
+    
+    def _trim(self) -> None:
+        # Forget the oldest finished jobs beyond the history limit
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+    
+    def _latest(self, name: str, key: tuple) -> Optional[Job]:
+        for job in reversed(self._jobs.values()):
+            if job.name == name and job.key == key:
+                return job
+        return None
+    
+    def latest(self, name: str, key: tuple = ()) -> Optional[Job]:
+        """Most recent job with this name and key, or None."""
+        with self._lock:
+            return self._latest(name, key)
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def jobs(self) -> List[Job]:
+        """All remembered jobs, newest first."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+    
+    def active(self) -> List[Job]:
+        return [job for job in self.jobs() if job.active]
+    
+    def cancel(self, job_id: str) -> bool:
+        """Ask a job to stop; returns False if it is unknown or already finished."""
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel()
+        return True
+    
+    def forget(self, job_id: str) -> None:
+        """Drop a finished job from the history."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and not job.active:
+                del self._jobs[job_id]
+    
+    def clear_finished(self) -> None:
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if not job.active]:
+                del self._jobs[job_id]
+    
+    def shutdown(self, cancel: bool = True) -> None:
+        """Stop accepting jobs, optionally cancelling the running ones, and wait for them."""
+        if cancel:
+            for job in self.active():
+                job.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProtectedFileStore:
+    """Password hashes of protected files, kept in an indexed SQLite table.
+    
+    Batch operations run in a single transaction, and the primary key on
+    ``path`` serves both exact lookups and directory-prefix range scans.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS protected (
+                path TEXT PRIMARY KEY,
+                password_hash TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+    
+    @staticmethod
+    def _prefix_range(directory: str) -> Tuple[str, str]:
+        # Everything under "dir/" sorts before "dir" + the character after the separator
+        directory = directory.rstrip(os.sep)
+        return directory + os.sep, directory + chr(ord(os.sep) + 1)
+    
+    def add_many(self, items: Iterable[Tuple[str, str]]) -> int:
+        """Protect every (path, password hash) pair in one transaction; returns the number written."""
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR REPLACE INTO protected VALUES (?, ?)", items)
+            return self._conn.total_changes - before
+    
+    def add(self, path: str, password_hash: str) -> None:
+        self.add_many([(path, password_hash)])
+    
+    def remove_many(self, paths: Iterable[str]) -> int:
+        """Unprotect every path in one transaction; returns the number removed."""
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany("DELETE FROM protected WHERE path = ?", ((path,) for path in paths))
+            return self._conn.total_changes - before
+    
+    def remove_prefix(self, directory: str) -> int:
+        """Unprotect ``directory`` and everything below it."""
+        low, high = self._prefix_range(directory)
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM protected WHERE path = ? OR (path >= ? AND path < ?)",
+                (directory.rstrip(os.sep), low, high)
+            ).rowcount
+    
+    def get(self, path: str) -> Optional[str]:
+        """Password hash protecting ``path``, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT password_hash FROM protected WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+    
+    def with_prefix(self, directory: str) -> Iterator[Tuple[str, str]]:
+        """(path, password hash) for ``directory`` and every protected path below it, in path order."""
+        low, high = self._prefix_range(directory)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, password_hash FROM protected WHERE path = ? OR (path >= ? AND path < ?) ORDER BY path",
+                (directory.rstrip(os.sep), low, high)
+            ).fetchall()
+        return iter(rows)
+    
+    def migrate_from(self, protected_files: Dict[str, str]) -> int:
+        """Import the flat ``protected_files`` mapping of the old JSON config."""
+        count = self.add_many(protected_files.items())
+        if count:
+            logger.info(f"Migrated {count} protected files into {self.path}")
+        return count
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM protected").fetchone()[0]
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
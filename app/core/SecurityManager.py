@@ -1,36 +1,80 @@
 import os
+import base64
 import hashlib
 import json
 import logging
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
-from cryptography.fernet import Fernet
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 from pathlib import Path
 
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+from app.core.AuditLogger import AuditLogger
+from app.core.FileUtils import FileUtils
+from app.core.HashCache import HashCache
+from app.core.HashScheduler import process_pool
+from app.core.IntegrityManifest import IntegrityManifest
+from app.core.ProtectedFileStore import ProtectedFileStore
+from app.core.IOScheduler import IOScheduler
+from app.core.StreamCipher import StreamCipher
+
+logger = logging.getLogger(__name__)
+
+# progress(files done, total files, bytes done)
+BulkProgress = Callable[[int, int, int], None]
+
+
+def bulk_crypto_job(key: bytes, action: str, path: str) -> Tuple[str, int]:
+    """Encrypt or decrypt one file in a worker process; returns (status, bytes)."""
+    cipher = StreamCipher(key)
+    size = os.path.getsize(path)
+    if action == "encrypt":
+        if cipher.is_encrypted(path):
+            return "skipped", 0
+        cipher.encrypt_file(path)
+    else:
+        if not cipher.is_encrypted(path) and not cipher.is_legacy_token(path):
+            return "skipped", 0
+        cipher.decrypt_file(path)
+    return "done", size
+
 class SecurityManager:
     """Manages security features for the file organizer."""
     
-    def __init__(self, config_path: str = 'security_config.json'):
+    def __init__(self, config_path: str = 'security_config.json', hash_cache: Optional[HashCache] = None,
+                 protected_store: Optional[ProtectedFileStore] = None, audit: Optional[AuditLogger] = None):
         self.config_path = config_path
+        self.hash_cache = hash_cache or HashCache.shared()
         self.config = self._load_config()
         self._setup_encryption()
-        self._setup_logging()
+        self.audit = audit or AuditLogger.shared()
+        self.protected = protected_store or ProtectedFileStore(f"{os.path.splitext(config_path)[0]}.protected.sqlite3")
+        self._migrate_protected_files()
+    
+    def _migrate_protected_files(self):
+        """Move the old in-config ``protected_files`` mapping into the protected-file store once."""
+        if 'protected_files' in self.config:
+            self.protected.migrate_from(self.config.pop('protected_files'))
+            self._save_config()
     
     def _setup_encryption(self):
-        """Initialize encryption key."""
+        """Initialize encryption key; the ciphers themselves are built on first use."""
         if not self.config.get('encryption_key'):
-            key = Fernet.generate_key()
+            # Same format as Fernet.generate_key(), without importing cryptography
+            key = base64.urlsafe_b64encode(os.urandom(32))
             self.config['encryption_key'] = key.decode()
             self._save_config()
-        self.fernet = Fernet(self.config['encryption_key'].encode())
+        self._cipher: Optional[StreamCipher] = None
     
-    def _setup_logging(self):
-        """Setup security logging."""
-        logging.basicConfig(
-            filename='security.log',
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
+    @property
+    def cipher(self) -> StreamCipher:
+        if self._cipher is None:
+            self._cipher = StreamCipher(self.config['encryption_key'].encode())
+        return self._cipher
+    
+    @property
+    def fernet(self):
+        return self.cipher.fernet
     
     def _load_config(self) -> Dict:
         """Load security configuration."""
@@ -48,66 +92,209 @@ class SecurityManager:
             json.dump(self.config, f, indent=4)
     
     def encrypt_file(self, file_path: str) -> bool:
-        """Encrypt a file."""
+        """Encrypt a file in bounded memory; the original is replaced only once the ciphertext is complete."""
         try:
-            with open(file_path, 'rb') as f:
-                data = f.read()
-            encrypted_data = self.fernet.encrypt(data)
-            with open(file_path, 'wb') as f:
-                f.write(encrypted_data)
-            logging.info(f'File encrypted: {file_path}')
+            self.cipher.encrypt_file(file_path)
+            self.audit.event("encrypt", file_path)
             return True
         except Exception as e:
-            logging.error(f'Encryption failed for {file_path}: {str(e)}')
+            self.audit.event("encrypt", file_path, "failure", logging.ERROR, error=str(e))
             return False
     
     def decrypt_file(self, file_path: str) -> bool:
-        """Decrypt a file."""
+        """Decrypt a chunked or legacy Fernet file; the original is replaced only once decryption succeeds."""
         try:
-            with open(file_path, 'rb') as f:
-                data = f.read()
-            decrypted_data = self.fernet.decrypt(data)
-            with open(file_path, 'wb') as f:
-                f.write(decrypted_data)
-            logging.info(f'File decrypted: {file_path}')
+            self.cipher.decrypt_file(file_path)
+            self.audit.event("decrypt", file_path)
             return True
         except Exception as e:
-            logging.error(f'Decryption failed for {file_path}: {str(e)}')
+            self.audit.event("decrypt", file_path, "failure", logging.ERROR, error=str(e))
             return False
     
-    def verify_file_integrity(self, file_path: str, stored_hash: Optional[str] = None) -> bool:
-        """Verify file integrity using SHA-256."""
+    def collect_files(self, directory: str, category: Optional[str] = None, include_hidden: bool = False) -> List[str]:
+        """Regular files below ``directory``, optionally limited to one category."""
+        files = []
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if not include_hidden and FileUtils.is_hidden_file(entry.name):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and \
+                                (category is None or FileUtils.get_file_category(entry.name) == category):
+                            files.append(entry.path)
+            except OSError as e:
+                logger.error(f'Cannot scan {current}: {str(e)}')
+        return files
+    
+    def bulk_encrypt(self, target: Union[str, Iterable[str]], category: Optional[str] = None,
+                     include_hidden: bool = False, progress: Optional[BulkProgress] = None) -> Dict:
+        """Encrypt a directory (optionally one category of it) or a list of paths in parallel."""
+        return self._run_bulk("encrypt", self._bulk_paths(target, category, include_hidden), progress)
+    
+    def bulk_decrypt(self, target: Union[str, Iterable[str]], category: Optional[str] = None,
+                     include_hidden: bool = False, progress: Optional[BulkProgress] = None) -> Dict:
+        """Decrypt a directory (optionally one category of it) or a list of paths in parallel."""
+        return self._run_bulk("decrypt", self._bulk_paths(target, category, include_hidden), progress)
+    
+    def resume_bulk(self, action: str, progress: Optional[BulkProgress] = None) -> Dict:
+        """Finish an interrupted or partly failed bulk run from its state file."""
+        state_path = FileOrganizerConfig.BULK_CRYPTO_STATE_FILE.format(action=action)
+        if not os.path.exists(state_path):
+            return {"processed": 0, "skipped": 0, "errors": [], "bytes": 0, "seconds": 0.0, "mbps": 0.0}
+        paths: List[str] = []
+        done = set()
+        with open(state_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final line from a crash
+                if "paths" in record:
+                    paths = record["paths"]
+                else:
+                    done.add(record["done"])
+        return self._run_bulk(action, [path for path in paths if path not in done], progress)
+    
+    def _bulk_paths(self, target: Union[str, Iterable[str]], category: Optional[str], include_hidden: bool) -> List[str]:
+        if isinstance(target, str):
+            return self.collect_files(target, category, include_hidden)
+        return [path for path in target
+                if category is None or FileUtils.get_file_category(os.path.basename(path)) == category]
+    
+    def _run_bulk(self, action: str, paths: List[str], progress: Optional[BulkProgress]) -> Dict:
+        """Run ``action`` over ``paths`` on a process pool, recording each finished file for resume.
+        
+        Files go through ``IOScheduler.map`` in on-disk order, so each device
+        has at most its own limit of files in flight; the per-device threads
+        only wait on the pool, where the encryption itself runs.  Each file is
+        encrypted atomically and already-processed files are recognised by
+        their header, so a rerun never double-encrypts.
+        """
+        summary = {"processed": 0, "skipped": 0, "errors": [], "bytes": 0}
+        state_path = FileOrganizerConfig.BULK_CRYPTO_STATE_FILE.format(action=action)
+        os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+        
+        stats = {}
+        for path in paths:
+            try:
+                stats[path] = os.stat(path)
+            except OSError as e:
+                summary["errors"].append(f"{path}: {e}")
+        key = self.config['encryption_key'].encode()
+        started = time.perf_counter()
+        
+        with open(state_path, 'w') as state, process_pool(os.cpu_count() or 1) as executor:
+            state.write(json.dumps({"paths": list(stats)}) + "\n")
+            state.flush()
+            completed = 0
+            for path, result, error in IOScheduler().map(
+                    lambda path: executor.submit(bulk_crypto_job, key, action, path).result(),
+                    stats, lambda path: path, stats.__getitem__):
+                completed += 1
+                if error is not None:
+                    summary["errors"].append(f"{path}: {error}")
+                    self.audit.event(action, path, "failure", logging.ERROR, error=str(error), bulk=True)
+                else:
+                    status, size = result
+                    summary["processed" if status == "done" else "skipped"] += 1
+                    summary["bytes"] += size
+                    self.audit.event(action, path, status, bulk=True)
+                    state.write(json.dumps({"done": path}) + "\n")
+                    state.flush()
+                if progress is not None:
+                    progress(completed, len(stats), summary["bytes"])
+        
+        if not summary["errors"]:
+            os.remove(state_path)
+        summary["seconds"] = time.perf_counter() - started
+        summary["mbps"] = summary["bytes"] / (1024 * 1024) / summary["seconds"] if summary["seconds"] > 0 else 0.0
+        self.audit.event(f"bulk_{action}", processed=summary["processed"], skipped=summary["skipped"],
+                         errors=len(summary["errors"]), mbps=round(summary["mbps"], 1))
+        return summary
+    
+    def verify_file_integrity(self, file_path: str, stored_hash: Optional[str] = None, use_cache: bool = True) -> bool:
+        """Verify file integrity using SHA-256.
+        
+        With ``use_cache`` the digest is taken from the shared hash cache while
+        the file's inode, size and mtime are unchanged; pass False to force a
+        full re-read.
+        """
         try:
-            sha256 = hashlib.sha256()
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b''):
-                    sha256.update(chunk)
-            current_hash = sha256.hexdigest()
+            if use_cache:
+                current_hash = self.hash_cache.get_or_compute(file_path, os.stat(file_path), FileUtils.get_file_hash)
+            else:
+                current_hash = FileUtils.get_file_hash(file_path)
+            if current_hash.startswith("ERROR"):
+                raise OSError(current_hash)
             
             if stored_hash:
                 return current_hash == stored_hash
             
             return current_hash
         except Exception as e:
-            logging.error(f'Integrity check failed for {file_path}: {str(e)}')
+            self.audit.event("verify_file", file_path, "failure", logging.ERROR, error=str(e))
             return False
     
+    def snapshot_tree(self, root: str, full: bool = False) -> Dict[str, int]:
+        """Record (or refresh) the integrity baseline of a whole tree."""
+        manifest = IntegrityManifest(IntegrityManifest.default_path(root))
+        try:
+            stats = manifest.update(root, full)
+        finally:
+            manifest.close()
+        self.audit.event("snapshot_tree", root, **stats)
+        return stats
+    
+    def verify_tree(self, root: str, full: bool = False) -> Dict[str, List[str]]:
+        """Compare a tree with its baseline; unchanged files are only re-read with ``full``."""
+        path = IntegrityManifest.default_path(root)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No integrity baseline for {root}; run snapshot_tree first")
+        manifest = IntegrityManifest(path)
+        try:
+            result = manifest.verify(root, full)
+        finally:
+            manifest.close()
+        for change, paths in result.items():
+            for changed_path in paths:
+                self.audit.event("verify_tree", os.path.join(root, changed_path), change, logging.WARNING)
+        return result
+    
     def log_access(self, file_path: str, action: str, user: str = 'system'):
         """Log file access."""
-        logging.info(f'Access: {user} - {action} - {file_path}')
+        self.audit.event("access", file_path, user=user, access=action)
     
     def set_file_password(self, file_path: str, password: str):
         """Set password protection for a file."""
+        self.protect_files([file_path], password)
+    
+    def protect_files(self, file_paths: Iterable[str], password: str) -> int:
+        """Protect many files with one password in a single write."""
         password_hash = hashlib.sha256(password.encode()).hexdigest()
-        self.config.setdefault('protected_files', {})[file_path] = password_hash
-        self._save_config()
-        logging.info(f'Password protection set for: {file_path}')
+        count = self.protected.add_many((file_path, password_hash) for file_path in file_paths)
+        self.audit.event("protect", files=count)
+        return count
+    
+    def unprotect_files(self, file_paths: Iterable[str]) -> int:
+        """Remove password protection from many files in a single write."""
+        count = self.protected.remove_many(file_paths)
+        self.audit.event("unprotect", files=count)
+        return count
+    
+    def protected_files_under(self, directory: str) -> List[str]:
+        """Protected paths at or below ``directory``."""
+        return [path for path, _ in self.protected.with_prefix(directory)]
     
     def verify_file_password(self, file_path: str, password: str) -> bool:
         """Verify password for a protected file."""
-        protected_files = self.config.get('protected_files', {})
-        if file_path not in protected_files:
+        stored_hash = self.protected.get(file_path)
+        if stored_hash is None:
             return True
         
         password_hash = hashlib.sha256(password.encode()).hexdigest()
-        return protected_files[file_path] == password_hash
\ No newline at end of file
+        return stored_hash == password_hash
\ No newline at end of file
@@ -0,0 +1,170 @@
+import os
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, wait
+from itertools import combinations
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+from app.core.DuplicateFinder import DuplicateFinder, FileRecord
+from app.core.FileLogger import FileLogger
+from app.core.FileUtils import FileUtils
+from app.core.HashScheduler import process_pool
+from app.core.IOScheduler import IOScheduler
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# progress(files chunked, files to chunk)
+ChunkProgress = Callable[[int, int], None]
+
+
+class SimilarPair(NamedTuple):
+    """Two files sharing content-defined chunks."""
+    first: str
+    second: str
+    shared_bytes: int
+    similarity: float  # shared bytes over the larger file's chunked size
+
+
+def chunk_job(path: str, algorithm: str, max_bytes: Optional[int]) -> List[Tuple[str, int]]:
+    """Chunk one file; module level so process pools can pickle it."""
+    return FileUtils.get_chunk_hashes(path, algorithm, max_bytes=max_bytes)
+
+
+class SimilarityFinder:
+    """Finds near-duplicate large files through content-defined chunking.
+    
+    Candidate files are split into variable-size chunks with a rolling gear
+    hash, so an edit only changes the chunks around it.  Chunk digests go into
+    an index from which the bytes shared by each pair of files are counted.
+    Two files can only reach ``threshold`` when the smaller is at least
+    ``threshold`` times the size of the larger, so files without such a
+    partner are never read.  Chunking is pure Python and CPU-bound, so it runs
+    on a process pool in on-disk order, and only the first ``max_bytes`` of
+    each file are chunked: similarity of larger files is estimated from them.
+    """
+    
+    def __init__(self, file_logger: Optional[FileLogger] = None,
+                 algorithm: str = FileOrganizerConfig.DUPLICATE_HASH_ALGORITHM,
+                 threshold: float = FileOrganizerConfig.CDC_SIMILARITY_THRESHOLD,
+                 min_file_size: int = FileOrganizerConfig.CDC_MIN_FILE_SIZE,
+                 max_bytes: Optional[int] = FileOrganizerConfig.CDC_MAX_BYTES_PER_FILE,
+                 io_scheduler: Optional[IOScheduler] = None):
+        self.logger = file_logger or FileLogger()
+        algorithm = FileUtils.resolve_hash_algorithm(algorithm)
+        FileUtils.get_hasher(algorithm)  # fail fast on an unknown backend
+        self.algorithm = algorithm
+        self.threshold = threshold
+        self.min_file_size = min_file_size
+        self.max_bytes = max_bytes
+        self.io_scheduler = io_scheduler or IOScheduler()
+        self.stats: Dict[str, int] = defaultdict(int)
+    
+    def candidates(self, roots: Sequence[str], include_hidden: bool = False) -> List[FileRecord]:
+        """Large files (one per inode) that have a partner of comparable size."""
+        finder = DuplicateFinder(self.logger)
+        inodes: Dict[Tuple[int, int], FileRecord] = {}
+        for root in finder.normalize_roots(roots):
+            for path, st in finder.scan(root, include_hidden):
+                if st.st_size >= self.min_file_size and (st.st_dev, st.st_ino) not in inodes:
+                    inodes[(st.st_dev, st.st_ino)] = FileRecord(path, st, [path], root)
+        
+        records = sorted(inodes.values(), key=lambda record: record.st.st_size)
+        # Every window [low, high] with a partner marks all of its records;
+        # windows only move right, so each record is added at most once
+        keep: List[FileRecord] = []
+        next_unkept = 0
+        low = 0
+        for high, record in enumerate(records):
+            while records[low].st.st_size < self.threshold * record.st.st_size:
+                low += 1
+            if low < high:
+                keep.extend(records[max(low, next_unkept):high + 1])
+                next_unkept = high + 1
+        return keep
+    
+    def chunk(self, records: Sequence[FileRecord], progress: Optional[ChunkProgress] = None,
+              cancel: Optional[threading.Event] = None) -> Dict[str, List[Tuple[str, int]]]:
+        """Chunk every record on a process pool; returns path -> [(digest, length)].
+        
+        Files are submitted in on-disk order with a bounded number in flight;
+        once ``cancel`` is set nothing more is submitted.
+        """
+        ordered = self.io_scheduler.order(records, lambda r: r.path, lambda r: r.st)
+        chunks: Dict[str, List[Tuple[str, int]]] = {}
+        workers = os.cpu_count() or 1
+        with process_pool(workers) as executor:
+            pending = iter(ordered)
+            in_flight = {}
+            done = 0
+            while True:
+                for record in ([] if cancel is not None and cancel.is_set() else pending):
+                    in_flight[executor.submit(chunk_job, record.path, self.algorithm, self.max_bytes)] = record
+                    if len(in_flight) >= 2 * workers:
+                        break
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = in_flight.pop(future)
+                    done += 1
+                    try:
+                        chunks[record.path] = future.result()
+                    except Exception as e:
+                        self.logger.log_action("errors", record.path, error_msg=f"Chunking failed: {e}")
+                        continue
+                    self.stats["bytes_read"] += sum(length for _, length in chunks[record.path])
+                if progress is not None:
+                    progress(done, len(ordered))
+        return chunks
+    
+    def find_similar(self, roots: Sequence[str], include_hidden: bool = False,
+                     progress: Optional[ChunkProgress] = None,
+                     cancel: Optional[threading.Event] = None) -> List[SimilarPair]:
+        """Pairs of files at or above the similarity threshold, most shared bytes first.
+        
+        ``stats["dedupable_bytes"]`` is what a chunk-level dedup store would
+        save over all chunked bytes: their total minus the size of their
+        distinct chunks.  Setting ``cancel`` stops chunking and pairs only the
+        files chunked so far.
+        """
+        self.stats = defaultdict(int)
+        records = self.candidates(roots, include_hidden)
+        chunks = self.chunk(records, progress, cancel)
+        sizes = {path: sum(length for _, length in file_chunks) for path, file_chunks in chunks.items()}
+        
+        # digest -> [(path, occurrences)], counting repeated chunks within a file once per occurrence
+        index: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        lengths: Dict[str, int] = {}
+        for path, file_chunks in chunks.items():
+            counts = Counter(digest for digest, _ in file_chunks)
+            for digest, length in file_chunks:
+                lengths[digest] = length
+            for digest, count in counts.items():
+                index[digest].append((path, count))
+        
+        shared: Dict[Tuple[str, str], int] = defaultdict(int)
+        for digest, holders in index.items():
+            if len(holders) < 2 or len(holders) > FileOrganizerConfig.CDC_MAX_CHUNK_FANOUT:
+                continue
+            for (first, first_count), (second, second_count) in combinations(sorted(holders), 2):
+                shared[(first, second)] += lengths[digest] * min(first_count, second_count)
+        
+        pairs = []
+        for (first, second), shared_bytes in shared.items():
+            similarity = shared_bytes / max(sizes[first], sizes[second])
+            if similarity >= self.threshold:
+                pairs.append(SimilarPair(first, second, shared_bytes, similarity))
+        pairs.sort(key=lambda pair: pair.shared_bytes, reverse=True)
+        
+        self.stats["files_chunked"] = len(chunks)
+        self.stats["chunks"] = sum(len(file_chunks) for file_chunks in chunks.values())
+        self.stats["dedupable_bytes"] = sum(sizes.values()) - sum(lengths.values())
+        logger.info(
+            f"Similarity scan: chunked {self.stats['files_chunked']} files into {self.stats['chunks']} chunks, "
+            f"{len(pairs)} similar pairs, {self.stats['dedupable_bytes']:,} bytes dedupable at chunk level"
+        )
+        return pairs
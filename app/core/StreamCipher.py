@@ -0,0 +1,157 @@
+import base64
+import os
+import shutil
+import struct
+from typing import BinaryIO, Optional
+
+from app.config.FileOrganiserConfig import FileOrganizerConfig
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FOENC\x01"
+# magic, chunk size, per-file salt
+HEADER = struct.Struct(f"!{len(MAGIC)}sI16s")
+TAG_SIZE = 16
+FERNET_PREFIX = b"gAAAAA"
+MAX_CHUNK_SIZE = 64 * 1024 * 1024  # bounds memory when reading untrusted headers
+
+
+class StreamCipher:
+    """Chunked AES-256-GCM file encryption with bounded memory.
+    
+    A file is a header followed by independently sealed chunks of
+    ``chunk_size`` plaintext bytes.  Each file gets its own key, derived with
+    HKDF from the Fernet key and a random salt, and each chunk's nonce is its
+    index plus a final-chunk flag (the STREAM construction), so chunks cannot
+    be reordered, dropped or truncated without failing authentication.  The
+    header is authenticated as associated data.  Output always goes to a
+    temporary file that replaces the original only once complete.  Files
+    encrypted with a single Fernet token by earlier versions still decrypt.
+    
+    ``cryptography`` is imported when a cipher is first created, so importing
+    this module (for ``is_encrypted`` checks, say) stays cheap.
+    """
+    
+    def __init__(self, fernet_key: bytes, chunk_size: int = FileOrganizerConfig.ENCRYPTION_CHUNK_SIZE):
+        from cryptography.fernet import Fernet
+        
+        self.master_key = base64.urlsafe_b64decode(fernet_key)
+        self.fernet = Fernet(fernet_key)
+        self.chunk_size = chunk_size
+    
+    def _aead(self, salt: bytes):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+        
+        key = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"file-organizer stream v1").derive(self.master_key)
+        return AESGCM(key)
+    
+    @staticmethod
+    def _nonce(index: int, last: bool) -> bytes:
+        return index.to_bytes(11, "big") + (b"\x01" if last else b"\x00")
+    
+    @staticmethod
+    def is_encrypted(file_path: str) -> bool:
+        """Whether ``file_path`` starts with the chunked format's magic."""
+        with open(file_path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    
+    @staticmethod
+    def is_legacy_token(file_path: str) -> bool:
+        """Whether ``file_path`` looks like a single Fernet token (version byte 0x80, base64)."""
+        with open(file_path, 'rb') as f:
+            return f.read(len(FERNET_PREFIX)) == FERNET_PREFIX
+    
+    @staticmethod
+    def _read_full(f: BinaryIO, size: int) -> bytes:
+        data = f.read(size)
+        while len(data) < size:
+            more = f.read(size - len(data))
+            if not more:
+                break
+            data += more
+        return data
+    
+    def encrypt_stream(self, src: BinaryIO, dst: BinaryIO) -> None:
+        """Encrypt everything readable from ``src`` into ``dst``."""
+        salt = os.urandom(16)
+        header = HEADER.pack(MAGIC, self.chunk_size, salt)
+        aead = self._aead(salt)
+        dst.write(header)
+        
+        index = 0
+        chunk = self._read_full(src, self.chunk_size)
+        while True:
+            # One chunk of look-ahead tells whether the current chunk is the last
+            following = self._read_full(src, self.chunk_size) if len(chunk) == self.chunk_size else b""
+            last = not following
+            dst.write(aead.encrypt(self._nonce(index, last), chunk, header))
+            if last:
+                return
+            chunk = following
+            index += 1
+    
+    def decrypt_stream(self, src: BinaryIO, dst: BinaryIO) -> None:
+        """Decrypt a chunked stream from ``src`` into ``dst``. Raises ValueError on tampering."""
+        header = self._read_full(src, HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError("Truncated header")
+        magic, chunk_size, salt = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("Not a chunked encrypted file")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"Implausible chunk size {chunk_size}")
+        aead = self._aead(salt)
+        
+        index = 0
+        sealed = self._read_full(src, chunk_size + TAG_SIZE)
+        while True:
+            following = self._read_full(src, chunk_size + TAG_SIZE) if len(sealed) == chunk_size + TAG_SIZE else b""
+            last = not following
+            try:
+                dst.write(aead.decrypt(self._nonce(index, last), sealed, header))
+            except Exception:
+                raise ValueError(f"Chunk {index} failed authentication (corrupt, truncated or wrong key)")
+            if last:
+                return
+            sealed = following
+            index += 1
+    
+    @staticmethod
+    def _temp_path(file_path: str) -> str:
+        return os.path.join(os.path.dirname(file_path), f".{os.path.basename(file_path)}.crypt-tmp")
+    
+    def _rewrite(self, file_path: str, transform, destination: Optional[str] = None) -> None:
+        """Stream ``file_path`` through ``transform`` into a temp file, then atomically replace."""
+        destination = destination or file_path
+        temp_path = self._temp_path(destination)
+        try:
+            with open(file_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                transform(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+            shutil.copymode(file_path, temp_path)
+            os.replace(temp_path, destination)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    def encrypt_file(self, file_path: str, destination: Optional[str] = None) -> None:
+        """Encrypt ``file_path`` in place (or into ``destination``). Raises on failure."""
+        if self.is_encrypted(file_path):
+            raise ValueError(f"{file_path} is already encrypted")
+        self._rewrite(file_path, self.encrypt_stream, destination)
+    
+    def _decrypt_legacy(self, src: BinaryIO, dst: BinaryIO) -> None:
+        # Single Fernet token from before the chunked format; necessarily in memory
+        dst.write(self.fernet.decrypt(src.read()))
+    
+    def decrypt_file(self, file_path: str, destination: Optional[str] = None) -> None:
+        """Decrypt ``file_path`` in place (or into ``destination``), chunked or legacy Fernet. Raises on failure."""
+        transform = self.decrypt_stream if self.is_encrypted(file_path) else self._decrypt_legacy
+        self._rewrite(file_path, transform, destination)
@@ -6,14 +6,25 @@ from pathlib import Path
 import time
 
 from scripts.FileOrganizer import FileOrganizer
+from app.config.FileOrganiserConfig import FileOrganizerConfig
 from app.core.FileUtils import FileUtils
-from app.core.FileAnalyzer import FileAnalyzer
+from app.core.FileAnalyzer import FileAnalyzer, StorageAnalysis
 from app.core.SecurityManager import SecurityManager
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
+from app.core.DedupExecutor import DedupExecutor
+from app.core.DirectoryListing import DirectoryListing
+from app.core.JobRunner import Job, JobRunner
 
-from typing import Tuple
+from typing import Dict, Optional, Tuple
+
+
+# Jobs that write the operation log; only one of them (or an inline undo) runs at a time
+LOG_WRITING_JOBS = ("organize", "dedup", "dedup_undo")
+
+
+@st.cache_resource
+def _job_runner() -> JobRunner:
+    """One runner per server process, so jobs outlive reruns and page reloads."""
+    return JobRunner()
 
 
 class StreamlitUI:
@@ -24,6 +35,9 @@ class StreamlitUI:
         self.utils = FileUtils()
         self.analyzer = FileAnalyzer()
         self.security = SecurityManager()
+        self.dedup = DedupExecutor(self.organizer.logger)
+        self.organizer.security_manager = self.security  # cipher built only if encryption is used
+        self.jobs = _job_runner()
         self._setup_page_config()
         self._apply_custom_styling()
     
@@ -350,92 +364,98 @@ class StreamlitUI:
         </div>
         """, unsafe_allow_html=True)
     
+    def _analysis_job(self, job: Job, directory: str) -> StorageAnalysis:
+        """Analyze ``directory`` in the background, reporting files seen so far."""
+        job.update(0, message="Scanning files")
+        return self.analyzer.analyze(directory, progress=lambda files: job.update(files, message=f"{files:,} files scanned"))
+    
+    @staticmethod
+    def _analysis_figures(analysis: StorageAnalysis) -> Dict:
+        """Charts for one analysis, drawn straight from its pre-aggregated arrays."""
+        import plotly.graph_objects as go
+        from plotly.colors import qualitative
+        
+        transparent = dict(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+        used = [i for i, size in enumerate(analysis.bytes_by_category) if size > 0]
+        storage = go.Figure(go.Pie(
+            labels=[analysis.categories[i] for i in used],
+            values=[analysis.bytes_by_category[i] for i in used],
+            customdata=[FileUtils.format_file_size(analysis.bytes_by_category[i]) for i in used],
+            hovertemplate='%{label}: %{customdata} (%{percent})<extra></extra>',
+            marker=dict(colors=qualitative.Set3)
+        ))
+        storage.update_layout(title='Storage Distribution', font=dict(size=12), title_font_size=16, **transparent)
+        
+        distribution = go.Figure(go.Bar(
+            x=analysis.categories, y=analysis.files_by_category,
+            marker=dict(color=analysis.files_by_category, colorscale='Viridis')
+        ))
+        distribution.update_layout(title='Number of Files by Category', xaxis_tickangle=-45, **transparent)
+        
+        age = go.Figure(go.Bar(
+            x=analysis.age_ranges, y=analysis.files_by_age,
+            marker=dict(color=analysis.files_by_age, colorscale='Blues')
+        ))
+        age.update_layout(title='Files by Age Range', **transparent)
+        return {"storage": storage, "distribution": distribution, "age": age}
+    
     def render_analysis(self, directory: str):
-        """Render enhanced analysis and reports section."""
+        """Render enhanced analysis and reports section from the directory's latest analysis job."""
+        job = self.jobs.latest("analysis", (directory,))
+        if job is None:
+            return
         st.markdown("## 📊 Storage Analytics Dashboard")
+        if not self._render_job_status(job, "Analysis"):
+            return
+        analysis: StorageAnalysis = job.result
+        
+        # Figures are built once per analysis; polling reruns reuse them
+        cached = st.session_state.get("analysis_figures")
+        if cached is None or cached[0] != job.id:
+            cached = st.session_state["analysis_figures"] = (job.id, self._analysis_figures(analysis))
+        figures = cached[1]
         
         # Create tabs for different analytics
         tab1, tab2, tab3, tab4 = st.tabs(["📈 Storage Usage", "📋 File Distribution", "⏰ Age Analysis", "💾 Space Report"])
         
         with tab1:
             st.markdown("### Storage Usage by Category")
-            storage_usage = self.analyzer.analyze_storage_usage(directory)
             
-            if storage_usage:
+            if analysis.total_files:
                 # Create two columns for chart and summary
                 col1, col2 = st.columns([2, 1])
                 
                 with col1:
-                    usage_df = pd.DataFrame([
-                        {'Category': cat, 'Size': float(size.split()[0])} 
-                        for cat, size in storage_usage.items()
-                    ])
-                    
-                    fig_storage = px.pie(
-                        usage_df, 
-                        values='Size', 
-                        names='Category',
-                        title='Storage Distribution',
-                        color_discrete_sequence=px.colors.qualitative.Set3
-                    )
-                    fig_storage.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font=dict(size=12),
-                        title_font_size=16
-                    )
-                    st.plotly_chart(fig_storage, use_container_width=True)
+                    st.plotly_chart(figures["storage"], use_container_width=True)
                 
                 with col2:
                     st.markdown("#### Summary")
-                    total_size = sum(float(size.split()[0]) for size in storage_usage.values())
                     
-                    for cat, size in storage_usage.items():
-                        size_val = float(size.split()[0])
-                        percentage = (size_val / total_size * 100) if total_size > 0 else 0
+                    for cat, size in zip(analysis.categories, analysis.bytes_by_category):
+                        percentage = (size / analysis.total_bytes * 100) if analysis.total_bytes > 0 else 0
                         
                         st.markdown(f"""
                         <div class="metric-card">
                             <strong style="color: #4a5568;">{cat}</strong><br>
-                            <span style="font-size: 1.1rem; color: #2d3748;">{size}</span><br>
+                            <span style="font-size: 1.1rem; color: #2d3748;">{self.utils.format_file_size(size)}</span><br>
                             <small style="color: #718096;">{percentage:.1f}% of total</small>
                         </div>
                         """, unsafe_allow_html=True)
         
         with tab2:
             st.markdown("### File Distribution Analysis")
-            distribution = self.analyzer.get_file_distribution(directory)
             
-            if distribution:
+            if analysis.total_files:
                 col1, col2 = st.columns([2, 1])
                 
                 with col1:
-                    dist_df = pd.DataFrame([
-                        {'Category': cat, 'Count': count}
-                        for cat, count in distribution.items()
-                    ])
-                    
-                    fig_dist = px.bar(
-                        dist_df, 
-                        x='Category', 
-                        y='Count',
-                        title='Number of Files by Category',
-                        color='Count',
-                        color_continuous_scale='Viridis'
-                    )
-                    fig_dist.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        xaxis_tickangle=-45
-                    )
-                    st.plotly_chart(fig_dist, use_container_width=True)
+                    st.plotly_chart(figures["distribution"], use_container_width=True)
                 
                 with col2:
                     st.markdown("#### File Counts")
-                    total_files = sum(distribution.values())
                     
-                    for cat, count in distribution.items():
-                        percentage = (count / total_files * 100) if total_files > 0 else 0
+                    for cat, count in zip(analysis.categories, analysis.files_by_category):
+                        percentage = (count / analysis.total_files * 100) if analysis.total_files > 0 else 0
                         
                         st.markdown(f"""
                         <div class="metric-card">
@@ -447,58 +467,36 @@ class StreamlitUI:
         
         with tab3:
             st.markdown("### File Age Distribution")
-            age_dist = self.analyzer.get_age_distribution(directory)
             
-            if age_dist:
-                age_df = pd.DataFrame([
-                    {'Age Range': age, 'Count': len(files)}
-                    for age, files in age_dist.items()
-                ])
-                
-                fig_age = px.bar(
-                    age_df, 
-                    x='Age Range', 
-                    y='Count',
-                    title='Files by Age Range',
-                    color='Count',
-                    color_continuous_scale='Blues'
-                )
-                fig_age.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)'
-                )
-                st.plotly_chart(fig_age, use_container_width=True)
+            if analysis.total_files:
+                st.plotly_chart(figures["age"], use_container_width=True)
         
         with tab4:
             st.markdown("### Disk Space Report")
-            space_report = self.analyzer.generate_disk_space_report(directory)
             
-            if space_report:
-                col1, col2 = st.columns(2)
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown(f"""
+                <div class="metric-card" style="text-align: center;">
+                    <h3 style="color: #667eea; margin: 0;">Total Space Used</h3>
+                    <div style="font-size: 2rem; font-weight: bold; color: #2d3748; margin: 0.5rem 0;">
+                        {self.utils.format_file_size(analysis.total_bytes)}
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            with col2:
+                st.markdown("#### Largest Files")
                 
-                with col1:
+                for file_path, size in analysis.largest_files[:5]:  # Show top 5
+                    filename = os.path.basename(file_path)
                     st.markdown(f"""
-                    <div class="metric-card" style="text-align: center;">
-                        <h3 style="color: #667eea; margin: 0;">Total Space Used</h3>
-                        <div style="font-size: 2rem; font-weight: bold; color: #2d3748; margin: 0.5rem 0;">
-                            {space_report.get('total_space', 'N/A')}
-                        </div>
+                    <div class="file-item">
+                        <strong>{filename}</strong><br>
+                        <small style="color: #718096;">{self.utils.format_file_size(size)}</small>
                     </div>
                     """, unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown("#### Largest Files")
-                    largest_files = space_report.get('largest_files', {})
-                    
-                    for i, (file_path, size) in enumerate(largest_files.items()):
-                        if i < 5:  # Show top 5
-                            filename = os.path.basename(file_path)
-                            st.markdown(f"""
-                            <div class="file-item">
-                                <strong>{filename}</strong><br>
-                                <small style="color: #718096;">{size}</small>
-                            </div>
-                            """, unsafe_allow_html=True)
     
     def render_sidebar(self) -> Tuple[str, bool, bool]:
         """Render the enhanced sidebar configuration panel."""
@@ -546,6 +544,12 @@ class StreamlitUI:
             # Advanced options
             with st.expander("🔬 Advanced Configuration"):
                 show_hidden = st.checkbox("👁️ Include Hidden Files", value=False)
+                st.multiselect(
+                    "🔐 Encrypt on Move",
+                    list(FileOrganizerConfig.EXTENSIONS_MAPPING),
+                    help="Files in these categories are encrypted as they are moved; undo decrypts them",
+                    key="encrypt_categories"
+                )
                 st.markdown("""
                 <div class="info-alert" style="padding: 0.75rem; margin: 0.5rem 0;">
                     💡 <strong>Note:</strong> All operations are logged for rollback capability
@@ -556,16 +560,98 @@ class StreamlitUI:
             if folder_path and os.path.exists(folder_path):
                 st.markdown("---")
                 self._render_directory_analysis(folder_path, show_hidden)
+            
+            self._render_jobs_panel()
         
         return folder_path, flatten_structure, show_hidden
     
+    def _scan_cache(self, folder_path: str, include_hidden: bool) -> Dict:
+        """Scan results for this directory, kept across reruns until the tree's fingerprint changes.
+        
+        The fingerprint itself is only re-walked every ``SCAN_CACHE_RECHECK_SECONDS``.
+        """
+        caches = st.session_state.setdefault("scan_cache", {})
+        key = (os.path.abspath(folder_path), include_hidden)
+        cache = caches.get(key)
+        now = time.time()
+        if cache is None or now - cache["checked"] > FileOrganizerConfig.SCAN_CACHE_RECHECK_SECONDS:
+            fingerprint = self.utils.tree_fingerprint(folder_path)
+            if cache is None or cache["fingerprint"] != fingerprint:
+                cache = caches[key] = {"fingerprint": fingerprint, "scanned": datetime.now()}
+            cache["checked"] = now
+        return cache
+    
+    @staticmethod
+    def _invalidate_scan_cache():
+        """Forget cached scan results, e.g. after files were moved or replaced."""
+        st.session_state.pop("scan_cache", None)
+    
+    def _sync_finished_jobs(self):
+        """Drop cached scans once per finished job that changed files, before anything renders from them."""
+        seen = st.session_state.setdefault("finished_jobs_seen", set())
+        for job in self.jobs.jobs():
+            if job.name in LOG_WRITING_JOBS and not job.active and job.id not in seen:
+                seen.add(job.id)
+                self._invalidate_scan_cache()
+    
+    def _log_writer_running(self) -> Optional[Job]:
+        """The active job writing the operation log, if any."""
+        return next((job for job in self.jobs.active() if job.name in LOG_WRITING_JOBS), None)
+    
+    def _render_job_status(self, job: Job, label: str) -> bool:
+        """Show a job's progress with Cancel, or its failure with Dismiss; True once its result is ready."""
+        if job.active:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.progress(job.fraction, text=f"{label}: {job.message or job.status} · {job.elapsed:.0f}s")
+            with col2:
+                if st.button("⏹️ Cancel", key=f"cancel_{job.id}"):
+                    job.cancel()
+            return False
+        
+        if st.button("✖️ Dismiss", key=f"dismiss_{job.id}"):
+            self.jobs.forget(job.id)
+            st.rerun()
+        if job.status == "failed":
+            st.error(f"{label} failed: {job.error}")
+        elif job.status == "cancelled":
+            st.warning(f"{label} cancelled after {job.elapsed:.1f}s")
+        return job.status == "done"
+    
+    def _render_jobs_panel(self):
+        """List recent background jobs with their status; active ones can be cancelled."""
+        jobs = self.jobs.jobs()
+        if not jobs:
+            return
+        status_icons = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌", "cancelled": "⏹️"}
+        st.markdown("---")
+        st.markdown("#### 🧵 Background Jobs")
+        for job in jobs[:10]:
+            target = os.path.basename(str(job.key[0]).rstrip(os.sep)) if job.key else ""
+            st.markdown(f"<small>{status_icons[job.status]} <strong>{job.name}</strong> {target} · "
+                        f"{job.status} · {job.elapsed:.0f}s</small>", unsafe_allow_html=True)
+            if job.active:
+                st.progress(job.fraction)
+                if st.button("⏹️ Cancel", key=f"panel_cancel_{job.id}"):
+                    job.cancel()
+        if any(not job.active for job in jobs) and st.button("🧹 Clear finished", key="jobs_clear"):
+            self.jobs.clear_finished()
+            st.rerun()
+    
     def _render_directory_analysis(self, folder_path: str, include_hidden: bool):
         """Render enhanced directory analysis in sidebar."""
         st.markdown("#### 📊 Directory Insights")
         
         try:
-            with st.spinner("Analyzing directory structure..."):
-                category_counts = self.organizer.count_files_by_category(folder_path, include_hidden)
+            if st.button("🔄 Refresh", key="scan_refresh", help="Rescan even if the directory looks unchanged"):
+                self._invalidate_scan_cache()
+            cache = self._scan_cache(folder_path, include_hidden)
+            st.caption(f"Scanned at {cache['scanned']:%H:%M:%S}")
+            
+            if "category_counts" not in cache:
+                with st.spinner("Analyzing directory structure..."):
+                    cache["category_counts"] = self.organizer.count_files_by_category(folder_path, include_hidden)
+            category_counts = cache["category_counts"]
             
             total_files = sum(category_counts.values())
             
@@ -603,22 +689,26 @@ class StreamlitUI:
             # Duplicate detection
             st.markdown("---")
             st.markdown("#### 🔍 Duplicate Detection")
-            with st.spinner("Scanning for duplicates..."):
-                duplicates = self.organizer.find_duplicates(folder_path, include_hidden)
+            duplicates = self._scan_duplicates(folder_path, include_hidden, cache)
             
-            if duplicates:
-                total_duplicates = sum(len(files) - 1 for files in duplicates.values())
+            if duplicates is None:
+                pass
+            elif duplicates:
+                total_duplicates = sum(len(group.inodes) - 1 for group in duplicates)
+                reclaimable = sum(group.reclaimable_bytes for group in duplicates)
                 st.markdown(f"""
                 <div class="warning-alert" style="padding: 0.75rem; margin: 0.5rem 0;">
                     <strong>⚠️ Duplicates Found</strong><br>
-                    <small>{total_duplicates} duplicate files in {len(duplicates)} groups</small>
+                    <small>{total_duplicates} duplicate files in {len(duplicates)} groups · {self.utils.format_file_size(reclaimable)} reclaimable</small>
                 </div>
                 """, unsafe_allow_html=True)
                 
                 with st.expander("📋 View Duplicate Details"):
-                    for i, (hash_val, file_list) in enumerate(duplicates.items()):
+                    for i, group in enumerate(duplicates):
                         if i < 3:  # Show only first 3 groups to avoid clutter
-                            st.markdown(f"**Group {i+1} ({len(file_list)} files):**")
+                            file_list = group.paths
+                            st.markdown(f"**Group {i+1} ({len(file_list)} files, "
+                                        f"{self.utils.format_file_size(group.reclaimable_bytes)} reclaimable):**")
                             for file_path in file_list:
                                 filename = os.path.basename(file_path)
                                 st.markdown(f"<div class='file-item'>{filename}</div>", unsafe_allow_html=True)
@@ -627,12 +717,17 @@ class StreamlitUI:
                         elif i == 3:
                             st.info(f"... and {len(duplicates) - 3} more duplicate groups")
                             break
+                
+                self._render_dedup_controls(duplicates)
             else:
                 st.markdown("""
                 <div class="success-alert" style="padding: 0.75rem; margin: 0.5rem 0;">
                     ✅ <strong>No Duplicates Found</strong>
                 </div>
                 """, unsafe_allow_html=True)
+            
+            self._render_dedup_jobs()
+            self._render_similarity_analysis(folder_path, include_hidden, cache)
                 
         except Exception as e:
             st.markdown(f"""
@@ -642,6 +737,144 @@ class StreamlitUI:
             </div>
             """, unsafe_allow_html=True)
     
+    def _duplicate_scan_job(self, job: Job, folder_path: str, include_hidden: bool):
+        """Collect duplicate groups into ``job.result`` as they are confirmed."""
+        stage_labels = {"sizing": "Grouping by size", "partial": "Partial hashing", "full": "Full hashing"}
+        job.result = []
+        
+        def on_progress(stage: str, done: int, total: int):
+            # Called inside the finder, which stops through the cancel event rather than an exception
+            job.report(done, total, stage_labels[stage])
+        
+        for group in self.organizer.iter_duplicate_groups([folder_path], include_hidden, progress=on_progress,
+                                                          cancel=job.cancel_event):
+            job.result.append(group)
+        job.check()
+        return job.result
+    
+    def _scan_duplicates(self, folder_path: str, include_hidden: bool, cache: Dict) -> Optional[list]:
+        """Scan for duplicates in a background job, showing groups as they are confirmed.
+        
+        Returns the groups found so far, largest saving first, or None while
+        the scan has not found any yet.  Stop keeps what was found; only a
+        completed scan is kept in ``cache``.
+        """
+        if "duplicates" in cache:
+            return cache["duplicates"]
+        key = (os.path.abspath(folder_path), include_hidden, cache["fingerprint"])
+        job = self.jobs.latest("duplicates", key)
+        if job is None:
+            job = self.jobs.submit("duplicates", self._duplicate_scan_job, folder_path, include_hidden, key=key)
+        
+        found = sorted(job.result or [], key=lambda group: group.reclaimable_bytes, reverse=True)
+        if job.status == "done":
+            cache["duplicates"] = found
+            return found
+        
+        if job.active:
+            counts = f"{job.done:,}" + (f" / {job.total:,}" if job.total else " files")
+            st.progress(job.fraction, text=f"{job.message or 'Scanning for duplicates'}: {counts}")
+            if found:
+                reclaimable = sum(group.reclaimable_bytes for group in found)
+                st.markdown(f"<small>{len(found)} groups so far · {self.utils.format_file_size(reclaimable)} reclaimable</small>",
+                            unsafe_allow_html=True)
+            if st.button("⏹️ Stop scan", key="duplicate_scan_stop"):
+                job.cancel()
+            return found or None
+        
+        if job.status == "failed":
+            st.error(f"Duplicate scan failed: {job.error}")
+        else:
+            st.caption(f"Scan stopped · showing {len(found)} groups confirmed so far")
+        if st.button("🔄 Rescan", key="duplicate_scan_restart"):
+            self.jobs.forget(job.id)
+            st.rerun()
+        return found
+    
+    def _similarity_job(self, job: Job, folder_path: str, include_hidden: bool):
+        """Chunk large files and pair near-duplicates, reporting files chunked."""
+        def on_progress(done: int, total: int):
+            job.report(done, total, "Chunking large files")
+        
+        result = self.organizer.find_similar_files([folder_path], include_hidden, progress=on_progress,
+                                                   cancel=job.cancel_event)
+        job.check()
+        return result
+    
+    def _render_similarity_analysis(self, folder_path: str, include_hidden: bool, cache: Dict):
+        """Render the optional near-duplicate (content-defined chunking) analysis from a background job."""
+        if not st.checkbox("🧩 Find near-duplicates", key="similarity_enabled",
+                           help="Chunks large files to find ones that are mostly, but not exactly, identical"):
+            return
+        if "similar" not in cache:
+            key = (os.path.abspath(folder_path), include_hidden, cache["fingerprint"])
+            job = self.jobs.latest("similarity", key)
+            if job is None:
+                job = self.jobs.submit("similarity", self._similarity_job, folder_path, include_hidden, key=key)
+            if not self._render_job_status(job, "Near-duplicate scan"):
+                return
+            cache["similar"] = job.result
+        pairs, dedupable = cache["similar"]
+        if not pairs:
+            st.caption("No near-duplicate files found")
+            return
+        st.caption(f"{len(pairs)} similar pairs · {self.utils.format_file_size(dedupable)} saveable with chunk-level dedup")
+        with st.expander("📋 View Similar Files"):
+            for pair in pairs[:10]:
+                st.markdown(f"<div class='file-item'>{os.path.basename(pair.first)} ↔ {os.path.basename(pair.second)}"
+                            f"<br><small>{pair.similarity:.0%} shared · {self.utils.format_file_size(pair.shared_bytes)}"
+                            f"</small></div>", unsafe_allow_html=True)
+    
+    def _render_dedup_controls(self, duplicates):
+        """Render the space-reclaiming actions for detected duplicates."""
+        with st.expander("♻️ Reclaim Space"):
+            action = st.selectbox(
+                "Action",
+                self.dedup.ACTIONS,
+                help="hardlink/reflink keep every path; delete removes the copies",
+                key="dedup_action"
+            )
+            keep = st.selectbox("Keep", self.dedup.KEEP_POLICIES, key="dedup_keep")
+            
+            busy = self._log_writer_running() is not None
+            col1, col2 = st.columns(2)
+            with col1:
+                run_dedup = st.button("♻️ Apply", use_container_width=True, key="dedup_apply", disabled=busy)
+            with col2:
+                undo_dedup = st.button("↩️ Undo", use_container_width=True, key="dedup_undo", disabled=busy)
+            
+            if run_dedup:
+                self.jobs.submit("dedup", self._dedup_job, duplicates, action, keep)
+            if undo_dedup:
+                self.jobs.submit("dedup_undo", self._dedup_undo_job)
+    
+    def _dedup_job(self, job: Job, duplicates, action: str, keep: str) -> Dict:
+        """Verify and replace duplicates in the background; not cancellable once files are being replaced."""
+        job.report(0, 0, "Verifying and replacing duplicates")
+        return self.dedup.execute(duplicates, action, keep)
+    
+    def _dedup_undo_job(self, job: Job) -> Tuple[bool, str]:
+        """Restore the files replaced by the last dedup run."""
+        job.report(0, 0, "Restoring replaced duplicates")
+        return self.dedup.undo_last_dedup()
+    
+    def _render_dedup_jobs(self):
+        """Show the latest dedup and dedup undo jobs; shown even once no duplicates remain."""
+        job = self.jobs.latest("dedup")
+        if job is not None and self._render_job_status(job, "Deduplication"):
+            summary = job.result
+            st.markdown(f"""
+            <div class="success-alert" style="padding: 0.75rem; margin: 0.5rem 0;">
+                ✅ <strong>{summary['replaced']} files replaced</strong><br>
+                <small>{self.utils.format_file_size(summary['bytes_reclaimed'])} reclaimable · {len(summary['errors'])} errors</small>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        job = self.jobs.latest("dedup_undo")
+        if job is not None and self._render_job_status(job, "Dedup undo"):
+            success, message = job.result
+            (st.success if success else st.warning)(message)
+    
     def render_main_content(self, folder_path: str):
         """Render the enhanced main content area."""
         # Create main layout columns
@@ -676,56 +909,61 @@ class StreamlitUI:
         with col2:
             return self._render_control_panel(folder_path)
     
+    @staticmethod
+    def _directory_listing(folder_path: str) -> DirectoryListing:
+        """The preview's listing of ``folder_path``, rescanned only when the directory changed."""
+        listing = st.session_state.get("preview_listing")
+        if listing is None or listing.path != folder_path or listing.is_stale():
+            listing = st.session_state["preview_listing"] = DirectoryListing(folder_path)
+            st.session_state["preview_page"] = 1
+        return listing
+    
     def _render_directory_preview(self, folder_path: str):
-        """Render enhanced directory structure preview."""
+        """Render enhanced directory structure preview, one page at a time."""
         with st.expander("📋 Directory Structure Preview", expanded=False):
             try:
-                items = sorted(os.listdir(folder_path))
-                total_items = len(items)
-                preview_items = items[:20]  # Show first 20 items
+                listing = self._directory_listing(folder_path)
+                total_items = len(listing)
+                page_size = FileOrganizerConfig.PREVIEW_PAGE_SIZE
+                pages = listing.page_count(page_size)
                 
-                if preview_items:
+                if total_items:
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        jump = st.text_input("🔎 Jump to name", key="preview_jump", placeholder="Start of a file name")
+                    # Apply a jump once, so paging afterwards is not pulled back to it
+                    if jump and jump != st.session_state.get("preview_jump_applied"):
+                        st.session_state["preview_page"] = listing.page_of(jump, page_size) + 1
+                    st.session_state["preview_jump_applied"] = jump
+                    st.session_state["preview_page"] = min(st.session_state.get("preview_page", 1), pages)
+                    with col2:
+                        page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1,
+                                               key="preview_page")
+                    st.caption(f"{total_items:,} items · showing {(page - 1) * page_size + 1:,}–"
+                               f"{min(page * page_size, total_items):,}")
+                    
                     # Create responsive columns
                     col1, col2 = st.columns(2)
                     
-                    for i, item in enumerate(preview_items):
-                        item_path = os.path.join(folder_path, item)
+                    for i, entry in enumerate(listing.page(page - 1, page_size)):
                         target_col = col1 if i % 2 == 0 else col2
                         
                         with target_col:
-                            if os.path.isdir(item_path):
+                            if entry.is_dir:
                                 st.markdown(f"""
                                 <div class="file-item">
-                                    <span style="color: #ed8936;">📁</span> <strong>{item}/</strong>
+                                    <span style="color: #ed8936;">📁</span> <strong>{entry.name}/</strong>
                                 </div>
                                 """, unsafe_allow_html=True)
                             else:
-                                try:
-                                    file_size = os.path.getsize(item_path)
-                                    size_str = self.utils.format_file_size(file_size)
-                                    file_icon = self._get_file_icon(item)
-                                    
-                                    st.markdown(f"""
-                                    <div class="file-item">
-                                        <span>{file_icon}</span> {item}
-                                        <br><small style="color: #718096;">{size_str}</small>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                except Exception:
-                                    file_icon = self._get_file_icon(item)
-                                    st.markdown(f"""
-                                    <div class="file-item">
-                                        <span>{file_icon}</span> {item}
-                                        <br><small style="color: #718096;">Size unknown</small>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                    
-                    if total_items > 20:
-                        st.markdown(f"""
-                        <div class="info-alert" style="text-align: center; padding: 0.75rem; margin-top: 1rem;">
-                            <strong>... and {total_items - 20} more items</strong>
-                        </div>
-                        """, unsafe_allow_html=True)
+                                file_icon = self._get_file_icon(entry.name)
+                                size_str = "Size unknown" if entry.size is None else self.utils.format_file_size(entry.size)
+                                st.markdown(f"""
+                                <div class="file-item">
+                                    <span>{file_icon}</span> {entry.name}
+                                    <br><small style="color: #718096;">{size_str}</small>
+                                </div>
+                                """, unsafe_allow_html=True)
                 else:
                     st.markdown("""
                     <div class="info-alert" style="text-align: center;">
@@ -911,8 +1149,22 @@ class StreamlitUI:
     #     total_time = time.time() - start_time
     #     progress_bar.progress(1.0)
     
+    def _organization_job(self, job: Job, folder_path: str, flatten_structure: bool, show_hidden: bool,
+                          encrypt_categories: list) -> Dict:
+        """Organize ``folder_path`` in the background; cancelling stops after the current file."""
+        job.update(0, 100, "Organizing files")
+        success, message = self.organizer.organize_files(
+            folder_path,
+            flatten_structure,
+            show_hidden,
+            progress_callback=lambda progress: job.update(round(progress * 100), 100),
+            encrypt_categories=encrypt_categories
+        )
+        return {"success": success, "message": message,
+                "flatten_structure": flatten_structure, "include_hidden": show_hidden}
+    
     def handle_organization(self, folder_path: str, flatten_structure: bool, show_hidden: bool):
-        """Handle the enhanced organization process."""
+        """Start organizing ``folder_path`` as a background job."""
         if not folder_path or not os.path.exists(folder_path):
             st.markdown("""
             <div class="error-alert">
@@ -921,24 +1173,29 @@ class StreamlitUI:
             </div>
             """, unsafe_allow_html=True)
             return
-
+        
+        running = self._log_writer_running()
+        if running is not None and (running.name, running.key) != ("organize", (folder_path,)):
+            st.warning(f"A {running.name} job is still running; wait for it to finish before organizing.")
+            return
+        self.jobs.submit("organize", self._organization_job, folder_path, flatten_structure, show_hidden,
+                         list(st.session_state.get("encrypt_categories", [])), key=(folder_path,))
+    
+    def _render_organization_job(self, folder_path: str):
+        """Show progress or the outcome of the latest organization job for ``folder_path``."""
+        job = self.jobs.latest("organize", (folder_path,))
+        if job is None:
+            return
+        
         st.markdown("## 🔄 Organization Process")
-
-        # Progress tracking
-        progress_container = st.container()
-        with progress_container:
-            progress_bar = st.progress(0)
-            status_container = st.empty()
-
-        start_time = time.time()
-
-        def update_progress(progress, current_file=""):
-            progress_bar.progress(progress)
-            elapsed = time.time() - start_time
-            estimated_total = elapsed / progress if progress > 0 else 0
-            remaining = max(0, estimated_total - elapsed)
-
-            status_container.markdown(f"""
+        total_time = job.elapsed
+        
+        if job.active:
+            progress = job.fraction
+            estimated_total = total_time / progress if progress > 0 else 0
+            remaining = max(0, estimated_total - total_time)
+            st.progress(progress)
+            st.markdown(f"""
             <div class="metric-card" style="text-align: center;">
                 <div style="display: flex; justify-content: space-between; margin-bottom: 1rem;">
                     <div>
@@ -947,70 +1204,35 @@ class StreamlitUI:
                     </div>
                     <div>
                         <strong style="color: #667eea;">Elapsed</strong><br>
-                        <span style="font-size: 1.5rem; color: #2d3748;">{elapsed:.1f}s</span>
+                        <span style="font-size: 1.5rem; color: #2d3748;">{total_time:.1f}s</span>
                     </div>
                     <div>
                         <strong style="color: #667eea;">Remaining</strong><br>
                         <span style="font-size: 1.5rem; color: #2d3748;">{remaining:.1f}s</span>
                     </div>
                 </div>
-                {f'<p style="color: #718096; margin: 0;"><strong>Processing:</strong> {current_file}</p>' if current_file else ''}
             </div>
             """, unsafe_allow_html=True)
-
-        # Execute organization
-        try:
-            success, message = self.organizer.organize_files(
-                folder_path,
-                flatten_structure,
-                show_hidden,
-                progress_callback=update_progress
-            )
-            
-            total_time = time.time() - start_time
-            progress_bar.progress(1.0)
-            
-            # Show results
-            if success:
-                st.markdown(f"""
-                <div class="success-alert slide-in">
-                    <h3 style="margin: 0; color: #2d3748;">✅ Organization Complete!</h3>
-                    <p style="margin: 0.5rem 0;">{message}</p>
-                    <div style="margin-top: 1rem; padding-top: 1rem; border-top: 1px solid rgba(0,0,0,0.1);">
-                        <strong>📊 Process Summary:</strong><br>
-                        <small style="color: #4a5568;">
-                            • Total time: {total_time:.2f} seconds<br>
-                            • Directory: {folder_path}<br>
-                            • Flattened structure: {'Yes' if flatten_structure else 'No'}<br>
-                            • Hidden files included: {'Yes' if show_hidden else 'No'}
-                        </small>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Show post-organization stats
-                self._show_organization_summary(folder_path)
-                
-            else:
-                st.markdown(f"""
-                <div class="error-alert">
-                    <h3 style="margin: 0; color: #2d3748;">❌ Organization Failed</h3>
-                    <p style="margin: 0.5rem 0;">{message}</p>
-                    <div style="margin-top: 1rem; padding-top: 1rem; border-top: 1px solid rgba(0,0,0,0.1);">
-                        <small style="color: #4a5568;">
-                            Time elapsed: {total_time:.2f} seconds<br>
-                            Check file permissions and available disk space.
-                        </small>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-        except Exception as e:
-            total_time = time.time() - start_time
+            if st.button("⏹️ Cancel Organization", key=f"cancel_{job.id}"):
+                job.cancel()
+            return
+        
+        if st.button("✖️ Dismiss", key=f"dismiss_{job.id}"):
+            self.jobs.forget(job.id)
+            st.rerun()
+        
+        if job.status == "cancelled":
+            st.markdown(f"""
+            <div class="warning-alert">
+                <h3 style="margin: 0; color: #2d3748;">⏹️ Organization Cancelled</h3>
+                <p style="margin: 0.5rem 0;">Stopped after {total_time:.2f} seconds. Files moved so far can be rolled back.</p>
+            </div>
+            """, unsafe_allow_html=True)
+        elif job.status == "failed":
             st.markdown(f"""
             <div class="error-alert">
                 <h3 style="margin: 0; color: #2d3748;">❌ Unexpected Error</h3>
-                <p style="margin: 0.5rem 0;">An error occurred during organization: {str(e)}</p>
+                <p style="margin: 0.5rem 0;">An error occurred during organization: {job.error}</p>
                 <div style="margin-top: 1rem; padding-top: 1rem; border-top: 1px solid rgba(0,0,0,0.1);">
                     <small style="color: #4a5568;">
                         Time elapsed: {total_time:.2f} seconds<br>
@@ -1019,9 +1241,43 @@ class StreamlitUI:
                 </div>
             </div>
             """, unsafe_allow_html=True)
-
+        elif job.result["success"]:
+            st.markdown(f"""
+            <div class="success-alert slide-in">
+                <h3 style="margin: 0; color: #2d3748;">✅ Organization Complete!</h3>
+                <p style="margin: 0.5rem 0;">{job.result['message']}</p>
+                <div style="margin-top: 1rem; padding-top: 1rem; border-top: 1px solid rgba(0,0,0,0.1);">
+                    <strong>📊 Process Summary:</strong><br>
+                    <small style="color: #4a5568;">
+                        • Total time: {total_time:.2f} seconds<br>
+                        • Directory: {folder_path}<br>
+                        • Flattened structure: {'Yes' if job.result['flatten_structure'] else 'No'}<br>
+                        • Hidden files included: {'Yes' if job.result['include_hidden'] else 'No'}
+                    </small>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # Show post-organization stats
+            self._show_organization_summary(folder_path)
+        else:
+            st.markdown(f"""
+            <div class="error-alert">
+                <h3 style="margin: 0; color: #2d3748;">❌ Organization Failed</h3>
+                <p style="margin: 0.5rem 0;">{job.result['message']}</p>
+                <div style="margin-top: 1rem; padding-top: 1rem; border-top: 1px solid rgba(0,0,0,0.1);">
+                    <small style="color: #4a5568;">
+                        Time elapsed: {total_time:.2f} seconds<br>
+                        Check file permissions and available disk space.
+                    </small>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+    
     def _show_organization_summary(self, folder_path: str):
         """Show detailed summary after organization."""
+        import plotly.graph_objects as go
+        
         st.markdown("### 📈 Organization Summary")
         
         try:
@@ -1072,23 +1328,18 @@ class StreamlitUI:
                 filtered_counts = {cat: count for cat, count in category_counts.items() if count > 0}
                 
                 if filtered_counts:
-                    chart_df = pd.DataFrame([
-                        {'Category': cat, 'Count': count}
-                        for cat, count in filtered_counts.items()
-                    ])
+                    counts = list(filtered_counts.values())
                     
                     # Create horizontal bar chart
-                    fig = px.bar(
-                        chart_df,
-                        x='Count',
-                        y='Category',
+                    fig = go.Figure(go.Bar(
+                        x=counts,
+                        y=list(filtered_counts),
                         orientation='h',
-                        title='Files by Category',
-                        color='Count',
-                        color_continuous_scale='Viridis'
-                    )
+                        marker=dict(color=counts, colorscale='Viridis')
+                    ))
                     
                     fig.update_layout(
+                        title='Files by Category',
                         plot_bgcolor='rgba(0,0,0,0)',
                         paper_bgcolor='rgba(0,0,0,0)',
                         height=400,
@@ -1109,6 +1360,11 @@ class StreamlitUI:
         """Handle the enhanced undo operation."""
         st.markdown("## ↩️ Rollback Operation")
         
+        running = self._log_writer_running()
+        if running is not None:
+            st.warning(f"A {running.name} job is still running; cancel it or wait for it to finish before rolling back.")
+            return
+        
         try:
             success, message = self.organizer.undo_last_organization()
             
@@ -1160,6 +1416,8 @@ class StreamlitUI:
     def render(self):
         """Main application entry point with enhanced flow control."""
         try:
+            self._sync_finished_jobs()
+            
             # Render header
             self.render_header()
             
@@ -1176,24 +1434,34 @@ class StreamlitUI:
                 organize_btn, undo_btn = button_results
                 analyze_btn = verify_btn = False
             
-            # Handle button actions
+            # Handle button actions; long operations run as background jobs
             if organize_btn:
                 self.handle_organization(folder_path, flatten_structure, show_hidden)
-                st.rerun()  # Refresh the app after organization
             
             if undo_btn:
                 self.handle_undo()
+                self._invalidate_scan_cache()
                 st.rerun()  # Refresh the app after undo
             
             if analyze_btn and folder_path and os.path.exists(folder_path):
-                self.render_analysis(folder_path)
+                self.jobs.submit("analysis", self._analysis_job, folder_path, key=(folder_path,))
             
             if verify_btn and folder_path and os.path.exists(folder_path):
+                self.jobs.submit("verification", self._verification_job, folder_path, key=(folder_path,))
+            
+            if folder_path and os.path.exists(folder_path):
+                self._render_organization_job(folder_path)
+                self.render_analysis(folder_path)
                 self._perform_directory_verification(folder_path)
             
             # Render footer
             self.render_footer()
             
+            # Poll running jobs by rerunning; scan results are cached, so reruns are cheap
+            if self.jobs.active():
+                time.sleep(FileOrganizerConfig.JOB_POLL_INTERVAL)
+                st.rerun()
+            
         except Exception as e:
             st.markdown(f"""
             <div class="error-alert">
@@ -1208,56 +1476,49 @@ class StreamlitUI:
             </div>
             """, unsafe_allow_html=True)
 
+    def _verification_job(self, job: Job, folder_path: str) -> Dict:
+        """Check access, symlinks, empty directories and file permissions in one walk."""
+        verification_results = {'accessibility': os.access(folder_path, os.R_OK | os.W_OK)}
+        broken_links = []
+        empty_dirs = []
+        permission_issues = []
+        
+        for checked, (root, dirs, files) in enumerate(os.walk(folder_path), 1):
+            job.update(checked, message=f"Checking {root}")
+            
+            # Check for broken symlinks
+            for item in dirs + files:
+                item_path = os.path.join(root, item)
+                if os.path.islink(item_path) and not os.path.exists(item_path):
+                    broken_links.append(item_path)
+            
+            # Check for empty directories
+            if not dirs and not files and root != folder_path:
+                empty_dirs.append(root)
+            
+            # Check file permissions
+            for file in files:
+                file_path = os.path.join(root, file)
+                try:
+                    if not os.access(file_path, os.R_OK):
+                        permission_issues.append(f"Read access denied: {file_path}")
+                except Exception as e:
+                    permission_issues.append(f"Permission check failed: {file_path} - {str(e)}")
+        
+        verification_results['broken_links'] = broken_links
+        verification_results['empty_directories'] = empty_dirs
+        verification_results['permission_issues'] = permission_issues[:10]  # Limit to first 10
+        return verification_results
+    
     def _perform_directory_verification(self, folder_path: str):
-        """Perform comprehensive directory verification."""
+        """Show the latest directory verification job for ``folder_path``."""
+        job = self.jobs.latest("verification", (folder_path,))
+        if job is None:
+            return
         st.markdown("### 🔍 Directory Verification")
-        
-        with st.spinner("Performing comprehensive directory verification..."):
-            verification_results = {}
-            
-            try:
-                # Check accessibility
-                verification_results['accessibility'] = os.access(folder_path, os.R_OK | os.W_OK)
-                
-                # Check for broken symlinks
-                broken_links = []
-                for root, dirs, files in os.walk(folder_path):
-                    for item in dirs + files:
-                        item_path = os.path.join(root, item)
-                        if os.path.islink(item_path) and not os.path.exists(item_path):
-                            broken_links.append(item_path)
-                
-                verification_results['broken_links'] = broken_links
-                
-                # Check for empty directories
-                empty_dirs = []
-                for root, dirs, files in os.walk(folder_path):
-                    if not dirs and not files and root != folder_path:
-                        empty_dirs.append(root)
-                
-                verification_results['empty_directories'] = empty_dirs
-                
-                # Check file permissions
-                permission_issues = []
-                for root, dirs, files in os.walk(folder_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        try:
-                            if not os.access(file_path, os.R_OK):
-                                permission_issues.append(f"Read access denied: {file_path}")
-                        except Exception as e:
-                            permission_issues.append(f"Permission check failed: {file_path} - {str(e)}")
-                
-                verification_results['permission_issues'] = permission_issues[:10]  # Limit to first 10
-                
-            except Exception as e:
-                st.markdown(f"""
-                <div class="error-alert">
-                    <h4 style="margin: 0;">❌ Verification Failed</h4>
-                    <p style="margin: 0.5rem 0;">Error during verification: {str(e)}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                return
+        if not self._render_job_status(job, "Verification"):
+            return
+        verification_results = job.result
         
         # Display verification results
         col1, col2 = st.columns(2)
@@ -1,12 +1,18 @@
 import os
 import shutil
-import json
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from typing import Dict, Tuple, Optional, Callable
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Optional, Callable
 
 from app.config.FileOrganiserConfig import FileOrganizerConfig
 from app.core.FileLogger import FileLogger
 from app.core.FileUtils import FileUtils
+from app.core.DuplicateFinder import DuplicateFinder, DuplicateGroup, ProgressCallback
+from app.core.HashCache import HashCache
+from app.core.SimilarityFinder import SimilarityFinder, SimilarPair
+from app.core.StreamCipher import StreamCipher
 
 import logging
 
@@ -20,6 +26,27 @@ class FileOrganizer:
     def __init__(self):
         self.logger = FileLogger()
         self.utils = FileUtils()
+        self.duplicate_finder = DuplicateFinder(self.logger, HashCache.shared())
+        self._cipher: Optional[StreamCipher] = None
+        self._cipher_lock = threading.Lock()
+        self.security_manager = None  # SecurityManager to take the cipher from; a default one otherwise
+    
+    @property
+    def cipher(self) -> StreamCipher:
+        """Cipher for encrypt-on-move, keyed from the security config on first use.
+        
+        Built under a lock, since undo workers may all reach for it at once.
+        """
+        if self._cipher is None:
+            with self._cipher_lock:
+                if self._cipher is None:
+                    from app.core.SecurityManager import SecurityManager
+                    self._cipher = (self.security_manager or SecurityManager()).cipher
+        return self._cipher
+    
+    @cipher.setter
+    def cipher(self, cipher: StreamCipher) -> None:
+        self._cipher = cipher
     
     def count_files_by_category(self, directory: str, include_hidden: bool = False) -> Dict[str, int]:
         """Count files in each category for preview."""
@@ -39,8 +66,13 @@ class FileOrganizer:
         return category_counts
     
     def organize_files(self, root_directory: str, flatten_structure: bool = False, 
-                      include_hidden: bool = False, progress_callback: Optional[Callable] = None) -> Tuple[bool, str]:
-        """Organize files recursively with progress tracking."""
+                      include_hidden: bool = False, progress_callback: Optional[Callable] = None,
+                      encrypt_categories: Optional[Iterable[str]] = None) -> Tuple[bool, str]:
+        """Organize files recursively with progress tracking.
+        
+        Files in ``encrypt_categories`` are encrypted on their way to the
+        category folder: read once, written once as ciphertext.
+        """
         if not os.path.exists(root_directory):
             return False, "Directory does not exist."
         
@@ -52,6 +84,7 @@ class FileOrganizer:
         
         processed_files = 0
         errors = []
+        encrypt_categories = set(encrypt_categories or ())
         
         # Organize files
         for dirpath, _, filenames in os.walk(root_directory):
@@ -59,7 +92,7 @@ class FileOrganizer:
                 if not include_hidden and self.utils.is_hidden_file(filename):
                     continue
                 
-                result = self._move_file(dirpath, filename, root_directory, flatten_structure)
+                result = self._move_file(dirpath, filename, root_directory, flatten_structure, encrypt_categories)
                 if result['success']:
                     processed_files += 1
                 else:
@@ -91,8 +124,9 @@ class FileOrganizer:
             logger.error(f"Error counting total files: {e}")
         return count
     
-    def _move_file(self, dirpath: str, filename: str, root_directory: str, flatten_structure: bool) -> Dict:
-        """Move a single file to its category folder."""
+    def _move_file(self, dirpath: str, filename: str, root_directory: str, flatten_structure: bool,
+                   encrypt_categories: Set[str] = frozenset()) -> Dict:
+        """Move a single file to its category folder, encrypting it on the way if its category asks for it."""
         try:
             src_path = os.path.join(dirpath, filename)
             category = self.utils.get_file_category(filename)
@@ -109,9 +143,19 @@ class FileOrganizer:
             # Handle duplicates
             dest_path = self.utils.get_unique_filename(dest_path)
             
-            # Move file
-            shutil.move(src_path, dest_path)
-            self.logger.log_action("moves", src_path, dest_path)
+            # Move file; the source is only removed once the ciphertext is in place
+            if category in encrypt_categories and not self.cipher.is_encrypted(src_path):
+                self.cipher.encrypt_file(src_path, dest_path)
+                try:
+                    os.remove(src_path)
+                except OSError:
+                    # Leave only the original rather than an unlogged encrypted copy
+                    os.remove(dest_path)
+                    raise
+                self.logger.log_action("moves", src_path, dest_path, extra={"encrypted": True})
+            else:
+                shutil.move(src_path, dest_path)
+                self.logger.log_action("moves", src_path, dest_path)
             
             return {'success': True, 'error': None}
             
@@ -144,40 +188,103 @@ class FileOrganizer:
         
         return empty_dirs
     
+    @staticmethod
+    def _preflight_destinations(moves: List[Dict]) -> Set[str]:
+        """Return the logged destinations that currently exist, listing each directory once."""
+        by_directory = defaultdict(list)
+        for move in moves:
+            by_directory[os.path.dirname(move["destination"])].append(move["destination"])
+        
+        existing = set()
+        for directory, destinations in by_directory.items():
+            try:
+                with os.scandir(directory or ".") as entries:
+                    names = {entry.name for entry in entries}
+            except OSError:
+                continue
+            existing.update(d for d in destinations if os.path.basename(d) in names)
+        return existing
+    
+    @staticmethod
+    def _undo_waves(moves: List[Dict]) -> Iterator[List[Dict]]:
+        """Split reversed moves into batches with no path shared between entries."""
+        wave, touched = [], set()
+        for move in moves:
+            paths = {move["source"], move["destination"]}
+            if touched & paths:
+                yield wave
+                wave, touched = [], set()
+            wave.append(move)
+            touched |= paths
+        if wave:
+            yield wave
+    
+    def _undo_move(self, move: Dict) -> None:
+        """Put one logged move back, decrypting files that were encrypted on the way."""
+        if move.get("encrypted"):
+            self.cipher.decrypt_file(move["destination"], move["source"])
+            os.remove(move["destination"])
+        else:
+            shutil.move(move["destination"], move["source"])
+    
     def undo_last_organization(self) -> Tuple[bool, str]:
         """Revert the last organization using the log file."""
         try:
             if not os.path.exists(self.logger.log_file):
                 return False, "No log file found - nothing to undo."
             
-            with open(self.logger.log_file, 'r') as f:
-                data = json.load(f)
+            data = self.logger.load()
+            recovered = self.logger.recover_undo_journal(data)
             
             if not data.get("moves"):
+                if recovered:
+                    return True, f"Recovered {recovered} file moves from an interrupted undo."
                 return False, "No previous organization actions found to undo."
             
             undone_count = 0
             errors = []
             remaining_moves = []
             
-            # Undo moves in reverse order
-            for move in reversed(data["moves"]):
-                try:
-                    if os.path.exists(move["destination"]):
-                        os.makedirs(os.path.dirname(move["source"]), exist_ok=True)
-                        shutil.move(move["destination"], move["source"])
-                        undone_count += 1
-                    else:
-                        errors.append(f"Destination file not found: {move['destination']}")
-                        remaining_moves.append(move)
-                except Exception as e:
-                    errors.append(f"Failed to undo {move['destination']}: {str(e)}")
-                    remaining_moves.append(move)
+            moves = list(reversed(data["moves"]))
+            existing = self._preflight_destinations(moves)
             
-            # Update log file
-            data["moves"] = remaining_moves
-            with open(self.logger.log_file, 'w') as f:
-                json.dump(data, f, indent=4)
+            with self.logger.open_undo_journal() as journal:
+                for wave in self._undo_waves(moves):
+                    ready = []
+                    for move in wave:
+                        if move["destination"] in existing:
+                            ready.append(move)
+                        else:
+                            errors.append(f"Destination file not found: {move['destination']}")
+                            remaining_moves.append(move)
+                    
+                    # Recreate every source directory once per wave, not once per file
+                    for source_dir in {os.path.dirname(move["source"]) for move in ready}:
+                        if source_dir:
+                            os.makedirs(source_dir, exist_ok=True)
+                    
+                    workers = min(FileOrganizerConfig.UNDO_MAX_WORKERS, len(ready)) or 1
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        futures = {executor.submit(self._undo_move, move): move
+                                   for move in ready}
+                        for future in as_completed(futures):
+                            move = futures[future]
+                            try:
+                                future.result()
+                            except Exception as e:
+                                errors.append(f"Failed to undo {move['destination']}: {str(e)}")
+                                remaining_moves.append(move)
+                                continue
+                            self.logger.journal_entry(journal, move)
+                            # Walk the chain: a restored source is the destination of an older move
+                            existing.discard(move["destination"])
+                            existing.add(move["source"])
+                            undone_count += 1
+            
+            # Keep the surviving entries in their original chronological order
+            order = {id(move): index for index, move in enumerate(data["moves"])}
+            remaining_moves.sort(key=lambda move: order[id(move)])
+            self.logger.commit_undo(data, remaining_moves)
             
             message = f"Successfully undone {undone_count} file moves."
             if errors:
@@ -189,66 +296,62 @@ class FileOrganizer:
             logger.error(f"Error during undo: {e}")
             return False, f"Error during undo operation: {str(e)}"
     
-    # def find_duplicates(self, directory: str, include_hidden: bool = False) -> Dict[str, List[str]]:
-        """Find duplicate files based on SHA-256 hash."""
-        hash_map = {}
-        duplicates = {}
-        
+    def find_duplicates(self, directory: str, include_hidden: bool = False) -> Dict[str, List[str]]:
+        """Find duplicate files, grouped by content hash."""
         try:
-            for dirpath, _, filenames in os.scandir(directory):
-                for filename in filenames:
-                    if not include_hidden and self.utils.is_hidden_file(filename):
-                        continue
-                    
-                    file_path = os.path.join(dirpath, filename)
-                    
-                    if os.path.isdir(file_path):
-                        continue
-                    
-                    file_hash = self.utils.get_file_hash(file_path)
-                    if file_hash.startswith("ERROR"):
-                        self.logger.log_action("errors", file_path, error_msg=f"Hashing failed: {file_hash}")
-                        continue
-                    
-                    if file_hash in hash_map:
-                        if file_hash not in duplicates:
-                            duplicates[file_hash] = [hash_map[file_hash]]
-                        duplicates[file_hash].append(file_path)
-                    else:
-                        hash_map[file_hash] = file_path
-                        
+            return self.duplicate_finder.find(directory, include_hidden)
         except Exception as e:
-            logger.error(f"Error finding duplicates: {e}")
-        
-        return duplicates
+            self.logger.log_action("errors", directory, error_msg=f"Error finding duplicates: {e}")
+            return {}
     
-    def find_duplicates(self, directory: str, include_hidden: bool = False):
-        from collections import defaultdict
-        from concurrent.futures import ThreadPoolExecutor
-
-        duplicates = defaultdict(list)
-        hash_map = {}
-
+    def find_duplicate_groups(self, directory: str, include_hidden: bool = False) -> List[DuplicateGroup]:
+        """Find duplicate inodes with their reclaimable space; hard links are not duplicates."""
         try:
-            files = list(self._all_files(directory, include_hidden))
-
-            def process_file(path):
-                return (path, self.utils.get_file_hash(path))
-
-            with ThreadPoolExecutor() as executor:
-                for path, file_hash in executor.map(process_file, files):
-                    if file_hash.startswith("ERROR"):
-                        self.logger.log_action("errors", path, error_msg=f"Hashing failed: {file_hash}")
-                        continue
-
-                    if file_hash in hash_map:
-                        duplicates[file_hash].append(path)
-                        if len(duplicates[file_hash]) == 1:
-                            duplicates[file_hash].append(hash_map[file_hash])
-                    else:
-                        hash_map[file_hash] = path
-
+            return self.duplicate_finder.find_groups(directory, include_hidden)
         except Exception as e:
             self.logger.log_action("errors", directory, error_msg=f"Error finding duplicates: {e}")
-
-        return {k: list(set(v)) for k, v in duplicates.items()}
+            return []
+    
+    def find_duplicates_across(self, roots: List[str], include_hidden: bool = False,
+                               cross_root_only: bool = False) -> List[DuplicateGroup]:
+        """Find duplicate inodes across several roots; each group records the root of every copy."""
+        try:
+            return self.duplicate_finder.find_groups_across(roots, include_hidden, cross_root_only)
+        except Exception as e:
+            self.logger.log_action("errors", ", ".join(roots), error_msg=f"Error finding duplicates: {e}")
+            return []
+    
+    def iter_duplicate_groups(self, roots: List[str], include_hidden: bool = False, cross_root_only: bool = False,
+                              progress: Optional[ProgressCallback] = None,
+                              cancel: Optional[threading.Event] = None) -> Iterator[DuplicateGroup]:
+        """Yield duplicate groups as soon as each is confirmed, reporting stage progress."""
+        try:
+            yield from self.duplicate_finder.iter_groups_across(roots, include_hidden, cross_root_only, progress, cancel)
+        except Exception as e:
+            self.logger.log_action("errors", ", ".join(roots), error_msg=f"Error finding duplicates: {e}")
+    
+    def find_similar_files(self, roots: List[str], include_hidden: bool = False,
+                           threshold: float = FileOrganizerConfig.CDC_SIMILARITY_THRESHOLD,
+                           progress: Optional[Callable[[int, int], None]] = None,
+                           cancel: Optional[threading.Event] = None) -> Tuple[List[SimilarPair], int]:
+        """Find near-duplicate large files by content-defined chunking; returns (pairs, chunk-dedupable bytes)."""
+        finder = SimilarityFinder(self.logger, threshold=threshold)
+        try:
+            pairs = finder.find_similar(roots, include_hidden, progress, cancel)
+            return pairs, finder.stats["dedupable_bytes"]
+        except Exception as e:
+            self.logger.log_action("errors", ", ".join(roots), error_msg=f"Error finding similar files: {e}")
+            return [], 0
+    
+    def tier_cold_files(self, directory: str, min_age_days: float = FileOrganizerConfig.TIER_MIN_AGE_DAYS,
+                        min_size: int = FileOrganizerConfig.TIER_MIN_SIZE, codec: str = FileOrganizerConfig.TIER_CODEC,
+                        bundle: bool = False, include_hidden: bool = False,
+                        progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Compress files older than ``min_age_days``; returns counts and bytes reclaimed. Undo with ``undo_last_tiering``."""
+        from app.core.ColdStorage import ColdStorage
+        return ColdStorage(self.logger, codec).run(directory, min_age_days, min_size, bundle, include_hidden, progress)
+    
+    def undo_last_tiering(self) -> Tuple[bool, str]:
+        """Revert the last cold-storage tiering using the log file."""
+        from app.core.ColdStorage import ColdStorage
+        return ColdStorage(self.logger).undo_last_tiering()
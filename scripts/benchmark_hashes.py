@@ -0,0 +1,58 @@
+"""Measure hashing throughput (MB/s) of every available dedup backend.
+
+Usage:
+    python -m scripts.benchmark_hashes [--size-mb 256] [--path FILE] [--repeat 3]
+
+Without ``--path`` a temporary file of random data is hashed, so the numbers
+reflect CPU cost with the file in page cache.  Point ``--path`` at a large
+file on the target volume to include storage throughput.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.core.FileUtils import FileUtils
+
+
+def benchmark(path: str, algorithm: str, repeat: int) -> float:
+    """Return the best observed MB/s for hashing ``path`` with ``algorithm``."""
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        digest = FileUtils.get_file_hash(path, algorithm)
+        elapsed = time.perf_counter() - start
+        if digest.startswith("ERROR"):
+            raise RuntimeError(digest)
+        best = max(best, size_mb / elapsed if elapsed > 0 else float("inf"))
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=256, help="size of the generated test file")
+    parser.add_argument("--path", help="hash this file instead of a generated one")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per algorithm; the best is reported")
+    args = parser.parse_args()
+
+    temp_path = None
+    path = args.path
+    if path is None:
+        fd, temp_path = tempfile.mkstemp(prefix="hash_bench_")
+        with os.fdopen(fd, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        path = temp_path
+
+    try:
+        print(f"{'algorithm':<12}{'MB/s':>10}")
+        for algorithm in FileUtils.available_hash_algorithms():
+            print(f"{algorithm:<12}{benchmark(path, algorithm, args.repeat):>10.1f}")
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Measure cold import time of the entry points and fail when one exceeds its budget.
+
+Usage:
+    python -m scripts.benchmark_imports [--repeat 5] [--scale 1.0] [--module NAME ...]
+
+Each module is imported in a fresh interpreter with ``-X importtime`` and
+the best of ``--repeat`` runs is reported, along with any dependency that
+should only load on first use but was imported eagerly.  The exit status is
+non-zero if a module is over budget (times ``--scale``, for slow machines)
+or pulled in a lazy dependency, so the script can guard CI and container
+start-up against regressions.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Module -> budget in milliseconds for its own import, on top of interpreter start-up
+BUDGETS_MS: Dict[str, float] = {
+    "app.core.FileUtils": 40,
+    "app.core.SecurityManager": 120,
+    "scripts.FileOrganizer": 150,
+    "app.interface.Streamlit": 1500,  # streamlit itself is unavoidable here
+}
+
+# Loaded on first use only; none of them may appear after importing the modules above
+LAZY_DEPENDENCIES = ("cryptography", "pandas", "plotly", "zstandard", "tarfile")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = "import sys, {module}; print(','.join(m for m in {lazy!r} if m in sys.modules))"
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """Import ``module`` in a fresh interpreter; returns (milliseconds, lazy dependencies it loaded)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, lazy=LAZY_DEPENDENCIES)],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": ROOT}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module and not fields[2].startswith("  "):
+            micros = int(fields[1])
+            break
+    else:
+        micros = 0  # already imported by the interpreter itself
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return micros / 1000, loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per module; the best is reported")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget, e.g. 2 on slow CI runners")
+    parser.add_argument("--module", action="append", help="only check these modules")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<28}{'ms':>9}{'budget':>9}  eager lazy deps")
+    for module in args.module or BUDGETS_MS:
+        budget = BUDGETS_MS.get(module, float("inf")) * args.scale
+        try:
+            runs = [measure(module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{module:<28}{'skipped':>9}{budget:>9.0f}  ({e})")
+            continue
+        best = min(ms for ms, _ in runs)
+        loaded = runs[0][1]
+        over = best > budget
+        failed |= over or bool(loaded)
+        print(f"{module:<28}{best:>9.1f}{budget:>9.0f}  {', '.join(loaded) or '-'}{'  OVER BUDGET' if over else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import os
+
+from app.core.DuplicateFinder import DuplicateFinder
+from app.core.FileLogger import FileLogger
+
+
+def _write(path, data: bytes) -> str:
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_group_by_size_without_prior_scan(tmp_path):
+    finder = DuplicateFinder(FileLogger(str(tmp_path / "log.json")))
+    first = _write(tmp_path / "a.bin", b"x" * 100)
+    second = _write(tmp_path / "b.bin", b"y" * 100)
+    lone = _write(tmp_path / "c.bin", b"z" * 50)
+    os.link(first, tmp_path / "a-link.bin")
+    
+    files = [(path, os.stat(path)) for path in (first, second, lone, str(tmp_path / "a-link.bin"))]
+    buckets = finder.group_by_size(files)
+    
+    assert list(buckets) == [100]
+    assert sorted(record.path for record in buckets[100]) == [first, second]
+    assert finder.stats["files_scanned"] == 4
+    assert finder.stats["hardlinks_collapsed"] == 1